@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Import-time benchmark for trollop: how long a fresh interpreter takes to
+import it, and to get as far as its first request or date, as a short-lived
+job or function cold start would.
+
+    python bench/imports.py
+    python bench/imports.py --runs 50 --json results.json
+
+Each scenario runs in a new interpreter, --runs times, and reports the
+median wall time less that of an interpreter that imports nothing, along
+with the modules of note it loaded.  Bytecode is compiled before timing.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencies that are slow to import, which trollop loads on first use.
+WATCHED = ('requests', 'isodate', 'json', 'orjson', 'concurrent.futures')
+
+SCENARIOS = [
+    ('import', 'import trollop'),
+    ('connection', 'import trollop\n'
+                   'trollop.TrelloConnection("key", "token")'),
+    ('first_date', 'import trollop\n'
+                   'trollop.parse_date("2024-01-02T03:04:05.678Z")'),
+    ('first_request', 'import trollop\n'
+                      'trollop.TrelloConnection("key", "token").session'),
+]
+
+REPORT = ('\nimport sys\n'
+          'print(",".join(m for m in %r if m in sys.modules))\n' % (WATCHED,))
+
+
+def env():
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    env['PYTHONPATH'] = ROOT
+    return env
+
+
+def run(code):
+    start = time.perf_counter()
+    output = subprocess.check_output([sys.executable, '-c', code], env=env(),
+                                     cwd=ROOT)
+    return time.perf_counter() - start, output.decode('ascii').strip()
+
+
+def median(values):
+    values = sorted(values)
+    return values[len(values) // 2]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('--json', help='also write the results to this file')
+    options = parser.parse_args(argv)
+
+    subprocess.check_call([sys.executable, '-m', 'compileall', '-q',
+                           os.path.join(ROOT, 'trollop')], env=env())
+    baseline = median([run('pass')[0] for _ in range(options.runs)])
+
+    results = {}
+    print('%-16s %10s  %s' % ('scenario', 'ms', 'loaded'))
+    for name, code in SCENARIOS:
+        times = []
+        for _ in range(options.runs):
+            elapsed, loaded = run(code + REPORT)
+            times.append(elapsed)
+        ms = (median(times) - baseline) * 1000
+        results[name] = {'ms': round(ms, 2), 'loaded': loaded.split(',')
+                         if loaded else []}
+        print('%-16s %10.1f  %s' % (name, ms, loaded or '-'))
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
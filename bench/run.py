@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks for trollop, run end to end against a local fake Trello server.
+
+    python bench/run.py
+    python bench/run.py --cards 500 --latency 0.02 --json results.json
+
+For each scenario, reports the number of requests the server saw, the wall
+time, and the peak memory allocated by Python during the run.  Each scenario
+starts with a fresh, cold connection.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trollop import TrelloConnection, RateLimiter  # noqa: E402
+from trollop.stats import NPlusOneWarning  # noqa: E402
+from server import FakeTrello, FakeTrelloServer  # noqa: E402
+
+
+def walk(board):
+    for lst in board.lists:
+        for card in lst.cards:
+            card.name
+            for member in card.members:
+                member.username
+
+
+def board_walk_lazy(conn, fake, options):
+    walk(conn.get_board(fake.board['id']))
+
+
+def board_walk_prefetch(conn, fake, options):
+    walk(conn.get_board(fake.board['id'], prefetch=[
+        'lists', 'cards', 'cards.members', 'lists.cards']))
+
+
+def card_members(conn, fake):
+    cards = conn.get_board(fake.board['id']).cards
+    return [m for card in cards for m in card.members]
+
+
+def member_hydration_lazy(conn, fake, options):
+    for member in card_members(conn, fake):
+        member.username
+
+
+def member_hydration_batch(conn, fake, options):
+    for member in conn.fetch_many(card_members(conn, fake)):
+        member.username
+
+
+def member_hydration_threads(conn, fake, options):
+    for member in conn.map_load(card_members(conn, fake)):
+        member.username
+
+
+def action_paging(conn, fake, options):
+    board = conn.get_board(fake.board['id'])
+    for action in board.iter_actions(page_size=options.page_size):
+        action.type
+
+
+def action_paging_prefetch(conn, fake, options):
+    board = conn.get_board(fake.board['id'])
+    for action in board.iter_actions(page_size=options.page_size,
+                                     prefetch=True):
+        action.type
+
+
+def action_paging_stream(conn, fake, options):
+    board = conn.get_board(fake.board['id'])
+    for action in board.iter_sublist('actions', page_size=options.page_size,
+                                     stream=True):
+        action.type
+
+
+def bulk_create(conn, fake, options):
+    lst = conn.get_list(next(iter(fake.lists)))
+    names = ['New card %d' % i for i in range(options.create)]
+    errors = [r.error for r in lst.add_cards(names) if r.error]
+    assert not errors, errors[0]
+
+
+SCENARIOS = [
+    board_walk_lazy,
+    board_walk_prefetch,
+    member_hydration_lazy,
+    member_hydration_batch,
+    member_hydration_threads,
+    action_paging,
+    action_paging_prefetch,
+    action_paging_stream,
+    bulk_create,
+]
+
+
+def run(scenario, server, options):
+    conn = TrelloConnection('key', 'token', api_url=server.url,
+                            workers=options.workers,
+                            limiter=RateLimiter(rate=1e9, burst=1e9))
+    server.fake.requests = 0
+    tracemalloc.start()
+    start = time.time()
+    try:
+        scenario(conn, server.fake, options)
+    finally:
+        elapsed = time.time() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        conn.close()
+    return {'scenario': scenario.__name__,
+            'requests': server.fake.requests,
+            'seconds': elapsed,
+            'peak_bytes': peak}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('--lists', type=int, default=10)
+    parser.add_argument('--cards', type=int, default=50,
+                        help='cards per list')
+    parser.add_argument('--members', type=int, default=20)
+    parser.add_argument('--actions', type=int, default=2000)
+    parser.add_argument('--create', type=int, default=200,
+                        help='cards created by bulk_create')
+    parser.add_argument('--page-size', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='seconds added to every request')
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--scenario', action='append',
+                        choices=[s.__name__ for s in SCENARIOS],
+                        help='run only this scenario (may be repeated)')
+    parser.add_argument('--json', metavar='PATH',
+                        help='also write the results to PATH as JSON')
+    options = parser.parse_args(argv)
+
+    # Some scenarios are N+1 on purpose, to compare against.
+    warnings.simplefilter('ignore', NPlusOneWarning)
+
+    scenarios = [s for s in SCENARIOS
+                 if not options.scenario or s.__name__ in options.scenario]
+    results = []
+    print('%-26s %9s %10s %12s' % ('scenario', 'requests', 'seconds',
+                                   'peak KiB'))
+    for scenario in scenarios:
+        # A fresh fake per scenario, so bulk_create can't skew the others.
+        fake = FakeTrello(lists=options.lists, cards=options.cards,
+                          members=options.members, actions=options.actions,
+                          latency=options.latency)
+        server = FakeTrelloServer(fake).start()
+        try:
+            result = run(scenario, server, options)
+        finally:
+            server.stop()
+        results.append(result)
+        print('%-26s %9d %10.3f %12.1f' % (
+            result['scenario'], result['requests'], result['seconds'],
+            result['peak_bytes'] / 1024.0))
+
+    if options.json:
+        with open(options.json, 'w') as f:
+            json.dump({'options': vars(options), 'results': results}, f,
+                      indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+A local stand-in for the parts of the Trello API that trollop uses, serving
+a synthetic board of configurable size with configurable latency.
+"""
+
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def make_id(n):
+    return '%024x' % n
+
+
+class FakeTrello(object):
+    """
+    Synthetic Trello data: one board with lists lists of cards cards each,
+    members members (each card assigned up to three of them), and actions
+    actions.  Every request is delayed by latency seconds, and counted.
+    """
+
+    def __init__(self, lists=10, cards=100, members=20, actions=2000,
+                 latency=0.0):
+        self.latency = latency
+        self.requests = 0
+        self._lock = threading.RLock()
+        self._next_id = 1
+
+        self.board = {'id': self.new_id(), 'name': 'Benchmark Board',
+                      'desc': '', 'closed': False, 'url': '', 'prefs': {},
+                      'pinned': False, 'idOrganization': None}
+        board_id = self.board['id']
+
+        self.members = {}
+        for i in range(members):
+            member = {'id': self.new_id(), 'username': 'member%d' % i,
+                      'fullName': 'Member %d' % i, 'url': ''}
+            self.members[member['id']] = member
+        member_ids = list(self.members)
+
+        self.lists = {}
+        self.cards = {}
+        for i in range(lists):
+            lst = {'id': self.new_id(), 'name': 'List %d' % i,
+                   'idBoard': board_id, 'closed': False, 'pos': i + 1,
+                   'url': ''}
+            self.lists[lst['id']] = lst
+            for j in range(cards):
+                n = i * cards + j
+                card = {'id': self.new_id(), 'name': 'Card %d' % n,
+                        'desc': 'Description of card %d. ' % n * 5,
+                        'idBoard': board_id, 'idList': lst['id'],
+                        'closed': False, 'pos': j + 1, 'url': '',
+                        'due': '2024-01-%02dT12:00:00.000Z' % (n % 28 + 1),
+                        'idLabels': [], 'badges': {}, 'checkItemStates': [],
+                        'idChecklists': [],
+                        'idMembers': [member_ids[(n + k) % members]
+                                      for k in range(min(3, members))]}
+                self.cards[card['id']] = card
+
+        # Newest first, as Trello returns them.
+        self.actions = [{'id': self.new_id(), 'type': 'commentCard',
+                         'date': '2024-01-01T00:00:00.000Z',
+                         'idMemberCreator': member_ids[i % members]
+                         if members else None,
+                         'data': {'text': 'Comment %d' % i}}
+                        for i in range(actions)]
+        self.actions.reverse()
+
+    def new_id(self):
+        with self._lock:
+            n = self._next_id
+            self._next_id += 1
+        return make_id(n)
+
+    # Request handling
+
+    def handle(self, method, path, query, body):
+        """Return (status, JSON-able response) for a request."""
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+        parts = [p for p in path.split('/') if p][1:]  # drop the '1'
+        try:
+            if method == 'GET':
+                return 200, self.get(parts, query)
+            if method == 'POST' and len(parts) == 3 and parts[2] == 'cards':
+                return 200, self.create_card(parts[1], query)
+            if method == 'PUT' and len(parts) == 2 and parts[0] == 'cards':
+                card = self.cards[parts[1]]
+                card.update(json.loads(body or '{}'))
+                return 200, card
+        except KeyError:
+            return 404, 'not found'
+        return 404, 'not found'
+
+    def get(self, parts, query):
+        if parts == ['batch']:
+            results = []
+            for url in query['urls'][0].split(','):
+                try:
+                    results.append({'200': self.get(
+                        [p for p in url.split('/') if p], {})})
+                except KeyError:
+                    results.append({'statusCode': 404})
+            return results
+
+        kind, obj_id = parts[0], parts[1]
+        sub = parts[2] if len(parts) > 2 else None
+        if kind == 'boards':
+            if obj_id != self.board['id']:
+                raise KeyError(obj_id)
+            if sub is None:
+                return self.nested_board(query)
+            if sub == 'actions':
+                return self.page(self.actions, query)
+            items = {'cards': self.cards, 'lists': self.lists,
+                     'members': self.members}.get(sub, {})
+            return self.page(list(items.values()), query)
+        if kind == 'lists':
+            lst = self.lists[obj_id]
+            if sub == 'cards':
+                cards = [c for c in self.cards.values()
+                         if c['idList'] == obj_id]
+                return self.page(cards, query)
+            return project(lst, query)
+        if kind == 'cards':
+            return project(self.cards[obj_id], query)
+        if kind == 'members':
+            return project(self.members[obj_id], query)
+        raise KeyError(kind)
+
+    def nested_board(self, query):
+        board = project(self.board, query)
+        if 'lists' in query:
+            board['lists'] = list(self.lists.values())
+        if 'members' in query:
+            board['members'] = list(self.members.values())
+        if 'cards' in query:
+            cards = [dict(c) for c in self.cards.values()]
+            if query.get('card_members') == ['true']:
+                for card in cards:
+                    card['members'] = [self.members[m]
+                                       for m in card['idMembers']]
+            board['cards'] = cards
+        if 'actions' in query:
+            board['actions'] = self.page(self.actions, query)
+        return board
+
+    def page(self, items, query):
+        if 'before' in query:
+            items = [i for i in items if i['id'] < query['before'][0]]
+        if 'since' in query:
+            items = [i for i in items if i['id'] > query['since'][0]]
+        limit = int(query.get('limit', ['1000'])[0])
+        return [project(i, query) for i in items[:limit]]
+
+    def create_card(self, list_id, query):
+        lst = self.lists[list_id]
+        card = {'id': self.new_id(), 'name': query['name'][0],
+                'desc': query.get('desc', [''])[0], 'idList': list_id,
+                'idBoard': lst['idBoard'], 'closed': False,
+                'pos': len(self.cards) + 1, 'idMembers': []}
+        with self._lock:
+            self.cards[card['id']] = card
+        return card
+
+
+def project(doc, query):
+    if 'fields' not in query:
+        return doc
+    keys = set(query['fields'][0].split(',')) | set(['id'])
+    return dict((k, v) for k, v in doc.items() if k in keys)
+
+
+class FakeTrelloServer(object):
+    """
+    Serves a FakeTrello over HTTP on a local port, from a background thread.
+
+        server = FakeTrelloServer(FakeTrello()).start()
+        conn = TrelloConnection(key, token, api_url=server.url)
+    """
+
+    def __init__(self, fake):
+        self.fake = fake
+        fake_trello = fake
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                BaseHTTPRequestHandler.setup(self)
+                # Headers and body are written separately; don't let Nagle's
+                # algorithm hold the body back.
+                self.connection.setsockopt(socket.IPPROTO_TCP,
+                                           socket.TCP_NODELAY, 1)
+
+            def do(self):
+                parsed = urlparse(self.path)
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else None
+                status, data = fake_trello.handle(
+                    self.command, parsed.path, parse_qs(parsed.query), body)
+                payload = json.dumps(data).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_PUT = do_DELETE = do
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever)
+        self.thread.daemon = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://%s:%d/1' % (host, port)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -12,7 +12,12 @@ setup(
         'requests>=1.2.0',
         'six>=1.10.0',
         'isodate>=0.5.4',
+        'futures>=3.0.0; python_version < "3"',
     ],
+    extras_require={
+        'export': ['numpy', 'pyarrow'],
+        'fast': ['orjson'],
+    },
     url='http://bitbucket.org/btubbs/trollop',
     description='A Python library for working with the Trello api.',
     long_description=open('README.rst').read(),
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+An asyncio flavour of TrelloConnection.  Requires Python 3.7 or later.
+"""
+
+import asyncio
+import functools
+import weakref
+
+from .lib import TrelloConnection, get_sublist, projection
+
+
+class BlockingFetchError(RuntimeError):
+    """
+    Raised when something not yet loaded is accessed from inside a running
+    event loop, where fetching it would block the loop.
+    """
+
+
+def in_event_loop():
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class AsyncTrelloConnection(TrelloConnection):
+    """
+    A TrelloConnection for asyncio code.  It uses the same Trello objects,
+    cache and rate limiting, but loads data with coroutines::
+
+        card = conn.get_card(card_id)
+        await card.load()
+        cards = await board.fetch('cards')
+        await conn.map_load(card.members)
+
+    Requests run on the connection's thread pool over its pooled HTTP
+    session, with at most concurrency of them in flight at once.  Once
+    loaded, fields and sublists are read synchronously from the cache as
+    usual.  Reading ones that aren't loaded yet raises BlockingFetchError
+    inside the event loop, rather than blocking it.
+    """
+
+    def __init__(self, api_key, oauth_token, concurrency=10, **kwargs):
+        kwargs.setdefault('workers', concurrency)
+        super().__init__(api_key, oauth_token, **kwargs)
+        self.concurrency = concurrency
+        # A semaphore belongs to the event loop it's first used in, so each
+        # loop the connection is used from gets its own.
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _send(self, method, path, *args, **kwargs):
+        if in_event_loop():
+            raise BlockingFetchError(
+                "%s %s would block the event loop; load it with await first"
+                % (method, path))
+        return super()._send(method, path, *args, **kwargs)
+
+    async def request_async(self, method, path, params=None, body=None):
+        return await self._run(functools.partial(
+            super().request, method, path, params, body))
+
+    async def _run(self, call):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.concurrency)
+            self._semaphores[loop] = semaphore
+        async with semaphore:
+            return await loop.run_in_executor(self.executor, call)
+
+    async def aget(self, path, params=None):
+        # Through get, so that identical GETs in flight share a request.
+        return await self._run(functools.partial(self.get, path, params))
+
+    async def aget_json(self, path, params=None):
+        # Parsed on the thread pool too, rather than in the event loop.
+        return await self._run(functools.partial(self.get_json, path, params))
+
+    async def apost(self, path, params=None, body=None):
+        return await self.request_async('POST', path, params, body)
+
+    async def aput(self, path, params=None, body=None):
+        return await self.request_async('PUT', path, params, body)
+
+    async def adelete(self, path, params=None, body=None):
+        return await self.request_async('DELETE', path, params, body)
+
+    async def load(self, obj, fields=None):
+        if fields:
+            data = await self.aget_json(obj._path, projection(fields))
+            self.merge(obj._path, data)
+        else:
+            data = await self.aget_json(obj._path)
+            self.remember(obj._path, data)
+        return obj
+
+    async def fetch_sublist(self, obj, name, fields=None):
+        sublist = get_sublist(type(obj), name)
+        params = projection(fields) if fields else None
+        path = sublist.path(obj)
+        data = await self.aget_json(path, params)
+        return sublist.fill(obj, data, partial=bool(fields))
+
+    async def map_load(self, objs):
+        objs = list(objs)
+        pending = dict((obj._path, obj) for obj in objs
+                       if obj._path not in self.cache)
+        await asyncio.gather(*[self.load(obj) for obj in pending.values()])
+        return objs
+
+
+def webhook_app(receiver):
+    """
+    Wrap a trollop.webhooks.WebhookReceiver as an ASGI application, which
+    answers Trello's HEAD request when a webhook is created and applies the
+    actions POSTed to it.  If the receiver fetches what it can't apply in
+    place, that's done on a thread, rather than in the event loop.
+    """
+    from .webhooks import InvalidSignature
+
+    async def app(scope, receive, send):
+        if scope['type'] != 'http':
+            return
+        method = scope['method']
+        if method in ('HEAD', 'GET'):
+            status = 200
+        elif method != 'POST':
+            status = 405
+        else:
+            chunks = []
+            more = True
+            while more:
+                message = await receive()
+                chunks.append(message.get('body', b''))
+                more = message.get('more_body', False)
+            body = b''.join(chunks)
+            headers = dict(scope.get('headers') or ())
+            signature = headers.get(b'x-trello-webhook')
+            call = functools.partial(receiver.receive, body, signature)
+            try:
+                if receiver.fetch:
+                    loop = asyncio.get_running_loop()
+                    await loop.run_in_executor(None, call)
+                else:
+                    call()
+                status = 200
+            except InvalidSignature:
+                status = 401
+            except ValueError:
+                status = 400
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': [(b'content-type', b'text/plain')]})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    return app
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+import threading
+import time
+from collections import OrderedDict
+
+
+# Sentinel for cache misses, so that falsy values can still be cached.
+MISSING = object()
+
+
+class Cache(object):
+    """
+    A bounded, in-memory LRU cache with optional expiry.  Each
+    TrelloConnection owns one, and uses it to hold fetched object data (keyed
+    by object path, like /cards/<id>) and sublists (keyed by sublist path,
+    like /boards/<id>/cards/).
+
+    An entry can hold the values of other keys as its children, as a sublist
+    holds the data of the objects in it.  They're found by get under their
+    own keys, but live and die with the entry: each counts toward its size,
+    and they're evicted or expire along with it, so a cached sublist never
+    outlives the data of its objects.
+
+    max_size is the maximum number of entries (and their children) kept
+    before the least recently used ones are evicted; None means unbounded.
+    The newest entry is kept even if it's bigger than that on its own.  ttl
+    is the default number of seconds an entry stays fresh; None means
+    entries never expire.
+
+    listeners are functions called with (key, value) whenever an entry or a
+    child is set, and with (key, MISSING) when it's invalidated, or (None,
+    MISSING) when the cache is cleared.  They aren't told about entries that
+    expire or are evicted to make room.  Listeners are called outside the
+    cache's lock, so they may use the cache themselves.
+
+    It's safe to share a Cache between threads.
+    """
+
+    def __init__(self, max_size=10000, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        # The keys of each entry's children, and the values held for each
+        # child key, by the key of the entry holding it.
+        self._children = {}
+        self._held = {}
+        self._weight = 0
+        self._lock = threading.RLock()
+        self.listeners = []
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        # Doesn't count as a hit or miss, and doesn't refresh LRU order.
+        with self._lock:
+            return self._lookup(key, False) is not MISSING
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._lookup(key, True)
+            if value is MISSING:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def _lookup(self, key, touch):
+        now = time.time()
+        try:
+            value, expires = self._entries[key]
+        except KeyError:
+            pass
+        else:
+            if expires is not None and expires <= now:
+                self._remove(key)
+            else:
+                if touch:
+                    # Move the entry to the most recently used end.
+                    self._entries[key] = self._entries.pop(key)
+                return value
+
+        # The most recently set of the entries holding key as a child.
+        for owner in reversed(list(self._held.get(key, ()))):
+            expires = self._entries[owner][1]
+            if expires is not None and expires <= now:
+                self._remove(owner)
+                continue
+            if touch:
+                self._entries[owner] = self._entries.pop(owner)
+            return self._held[key][owner]
+        return MISSING
+
+    def set(self, key, value, ttl=None, children=None):
+        """
+        Cache value under key.  children is a sequence of (key, value) pairs
+        for the entry to hold as well, replacing any entries of their own.
+        """
+        children = list(children or ())
+        with self._lock:
+            if ttl is None:
+                ttl = self.ttl
+            expires = None if ttl is None else time.time() + ttl
+
+            self._remove(key)
+            self._entries[key] = (value, expires)
+            self._weight += 1
+            # Whatever holds key as a child now holds this value.
+            for owner in self._held.get(key, ()):
+                self._held[key][owner] = value
+
+            if children:
+                kids = self._children[key] = set()
+                for child, child_value in children:
+                    if child in self._entries and child not in self._children:
+                        self._remove(child)
+                    self._held.setdefault(child, OrderedDict())[key] = \
+                        child_value
+                    kids.add(child)
+                self._weight += len(kids)
+
+            if self.max_size is not None:
+                while self._weight > self.max_size and len(self._entries) > 1:
+                    self._remove(next(iter(self._entries)))
+                    self.evictions += 1
+        self._notify(key, value)
+        for child, child_value in children:
+            self._notify(child, child_value)
+
+    def _remove(self, key):
+        # Drop the entry for key, and the children it holds.  Returns whether
+        # there was one.
+        if self._entries.pop(key, MISSING) is MISSING:
+            return False
+        self._weight -= 1
+        for child in self._children.pop(key, ()):
+            self._weight -= 1
+            owners = self._held[child]
+            del owners[key]
+            if not owners:
+                del self._held[child]
+        return True
+
+    def _release(self, key):
+        # Drop the values held for key as a child.  Returns whether there
+        # were any.
+        owners = self._held.pop(key, None)
+        if not owners:
+            return False
+        for owner in owners:
+            self._children[owner].discard(key)
+            self._weight -= 1
+        return True
+
+    def invalidate(self, key):
+        with self._lock:
+            found = self._remove(key)
+            found = self._release(key) or found
+        if found:
+            self._notify(key, MISSING)
+
+    def invalidate_prefix(self, prefix):
+        with self._lock:
+            keys = set(k for k in self._entries if k.startswith(prefix))
+            keys.update(k for k in self._held if k.startswith(prefix))
+            for key in keys:
+                self._remove(key)
+                self._release(key)
+        for key in keys:
+            self._notify(key, MISSING)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._children.clear()
+            self._held.clear()
+            self._weight = 0
+        self._notify(None, MISSING)
+
+    def _notify(self, key, value):
+        for listener in self.listeners:
+            listener(key, value)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions}
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+"""
+Columnar export of a board's cards, actions, checklists and members, for
+analytics.  Each kind is read straight from the JSON Trello returns, in
+chunks, and turned into a Table of one column per field: NumPy arrays when
+NumPy is installed, and the standard library's array otherwise.  Dates are
+parsed a whole column at a time.
+
+With pyarrow installed, Tables convert to Arrow, and write_parquet writes a
+board to Parquet files a chunk (row group) at a time.
+"""
+
+import datetime
+import json
+import os
+import re
+from array import array
+from collections import OrderedDict
+
+import six
+
+from .lib import (BoolField, DateField, Field, IntField, ListField,
+                  get_class, get_descriptor, get_sublist, parse_date,
+                  projection)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+KINDS = ('cards', 'actions', 'checklists', 'members')
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+# A UTC offset, like +01:00, at the end of a date with a time.
+OFFSET_RE = re.compile(r'T.*[+-]\d\d(:?\d\d)?$')
+
+
+class Table(object):
+    """
+    Columns of equal length, by name.  Date columns hold UTC datetime64[ms]
+    values (NaT where missing) with NumPy, or float seconds since the epoch
+    (NaN where missing) without it.  Int and bool columns are arrays too,
+    unless a value is missing.  Everything else is a list of the JSON values.
+    """
+
+    def __init__(self, columns, types):
+        self.columns = columns
+        self.types = types
+
+    def __len__(self):
+        for column in self.columns.values():
+            return len(column)
+        return 0
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def to_arrow(self):
+        """Return the table as a pyarrow.Table.  Requires pyarrow."""
+        if pyarrow is None:
+            raise ImportError('to_arrow requires pyarrow')
+        arrays = [arrow_array(self.columns[name], self.types[name])
+                  for name in self.columns]
+        return pyarrow.Table.from_arrays(arrays, names=list(self.columns))
+
+
+def columns_for(cls):
+    """
+    Return (key, type) pairs for the Fields cls declares, id first, where
+    type is one of 'date', 'int', 'bool', 'list' or 'object'.
+    """
+    types = {'id': 'object'}
+    for name in dir(cls):
+        field = get_descriptor(cls, name)
+        if not isinstance(field, Field):
+            continue
+        if isinstance(field, DateField):
+            kind = 'date'
+        elif isinstance(field, IntField):
+            kind = 'int'
+        elif isinstance(field, BoolField):
+            kind = 'bool'
+        elif isinstance(field, ListField):
+            kind = 'list'
+        else:
+            kind = 'object'
+        types[field.key] = kind
+    keys = ['id'] + sorted(k for k in types if k != 'id')
+    return [(key, types[key]) for key in keys]
+
+
+def make_table(cls, docs):
+    """Build a Table from a list of JSON documents for cls objects."""
+    columns = OrderedDict()
+    types = OrderedDict()
+    for key, kind in columns_for(cls):
+        values = [d.get(key) for d in docs]
+        if kind == 'date':
+            values = parse_dates(values)
+        elif kind == 'int':
+            values = typed_column(values, 'q', 'int64')
+        elif kind == 'bool':
+            values = typed_column(values, 'b', 'bool')
+        columns[key] = values
+        types[key] = kind
+    return Table(columns, types)
+
+
+def typed_column(values, typecode, dtype):
+    if None in values:
+        return values
+    if numpy is not None:
+        return numpy.array(values, dtype=dtype)
+    return array(typecode, values)
+
+
+def parse_dates(values):
+    """
+    Parse a column of Trello date strings (or Nones) at once.  With NumPy,
+    returns a datetime64[ms] array; otherwise an array of float seconds
+    since the epoch.
+    """
+    if numpy is not None:
+        try:
+            # NumPy parses ISO 8601 itself, but only as UTC: without the 'Z'
+            # suffix, and without offsets, which it warns about.
+            return numpy.array([naive_utc(v) for v in values],
+                               dtype='datetime64[ms]')
+        except ValueError:
+            pass
+    seconds = array('d')
+    parsed = {}
+    for value in values:
+        if value not in parsed:
+            parsed[value] = epoch_seconds(value)
+        seconds.append(parsed[value])
+    if numpy is not None:
+        ms = numpy.array(seconds) * 1000
+        return numpy.where(numpy.isnan(ms), numpy.datetime64('NaT'),
+                           ms.astype('datetime64[ms]'))
+    return seconds
+
+
+def naive_utc(value):
+    """Turn a date string into one in UTC with no zone, for NumPy."""
+    if not value:
+        return 'NaT'
+    if value.endswith('Z'):
+        return value[:-1]
+    if OFFSET_RE.search(value):
+        dt = parse_date(value)
+        return (dt.replace(tzinfo=None) - dt.utcoffset()).isoformat()
+    return value
+
+
+def epoch_seconds(value):
+    if not value:
+        return float('nan')
+    dt = parse_date(value)
+    if dt.tzinfo is not None:
+        dt = dt.replace(tzinfo=None) - dt.utcoffset()
+    return (dt - EPOCH).total_seconds()
+
+
+def arrow_array(values, kind):
+    if kind == 'date':
+        if numpy is None:
+            ms = [None if v != v else int(v * 1000) for v in values]
+            return pyarrow.array(ms, pyarrow.timestamp('ms', tz='UTC'))
+        return pyarrow.array(values, pyarrow.timestamp('ms', tz='UTC'))
+    if kind == 'int':
+        return pyarrow.array(list(values), pyarrow.int64())
+    if kind == 'bool':
+        return pyarrow.array([None if v is None else bool(v) for v in values],
+                             pyarrow.bool_())
+    if kind == 'list':
+        return pyarrow.array(values, pyarrow.list_(pyarrow.string()))
+    # Everything else is a string column, so that every chunk of a kind has
+    # the same schema.  Nested JSON is kept as JSON.
+    return pyarrow.array(
+        [v if v is None or isinstance(v, six.string_types) else json.dumps(v)
+         for v in values], pyarrow.string())
+
+
+def iter_docs(board, kind, chunk_size=None):
+    """
+    Yield the JSON documents in the sublist of board called kind, like
+    'cards' or 'actions', in lists of at most chunk_size (or all in one list
+    if chunk_size is None).  Actions are streamed a page at a time; other
+    sublists are fetched in one request.  Only the declared fields are
+    fetched, and nothing is cached.
+    """
+    sublist = get_sublist(type(board), kind)
+    keys = [key for key, _ in columns_for(get_class(sublist.cls))]
+    if kind == 'actions':
+        page_size = min(chunk_size or 1000, 1000)
+        docs = []
+        for action in sublist.iterate(board, page_size=page_size,
+                                      fields=keys):
+            docs.append(action._data)
+            if len(docs) == chunk_size:
+                yield docs
+                docs = []
+        if docs:
+            yield docs
+        return
+    docs = board._conn.get_json(sublist.path(board), projection(keys))
+    if chunk_size is None:
+        yield docs
+        return
+    for start in range(0, len(docs), chunk_size):
+        yield docs[start:start + chunk_size]
+
+
+def iter_tables(board, kind, chunk_size=10000):
+    """
+    Yield Tables of at most chunk_size rows for the sublist of board called
+    kind.  See iter_docs.
+    """
+    cls = get_class(get_sublist(type(board), kind).cls)
+    for docs in iter_docs(board, kind, chunk_size):
+        yield make_table(cls, docs)
+
+
+def export_board(board, kinds=KINDS):
+    """
+    Return a dict of a Table per kind for board, each holding the whole
+    sublist.
+    """
+    tables = {}
+    for kind in kinds:
+        cls = get_class(get_sublist(type(board), kind).cls)
+        docs = [d for chunk in iter_docs(board, kind) for d in chunk]
+        tables[kind] = make_table(cls, docs)
+    return tables
+
+
+def write_parquet(board, directory, kinds=KINDS, chunk_size=10000):
+    """
+    Write each kind of board's objects to <directory>/<kind>.parquet, one
+    row group per chunk of chunk_size rows, so large boards never have to be
+    held in memory at once.  Requires pyarrow.  Returns the paths written.
+    """
+    if pyarrow is None:
+        raise ImportError('write_parquet requires pyarrow')
+    paths = []
+    for kind in kinds:
+        path = os.path.join(directory, kind + '.parquet')
+        writer = None
+        try:
+            for table in iter_tables(board, kind, chunk_size):
+                arrow_table = table.to_arrow()
+                if writer is None:
+                    writer = pyarrow.parquet.ParquetWriter(path,
+                                                           arrow_table.schema)
+                writer.write_table(arrow_table)
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is not None:
+            paths.append(path)
+    return paths
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming file uploads: a multipart/form-data body that's read a chunk at a
+time from the file, buffer or memory map being uploaded, instead of being
+built in memory.
+"""
+
+import os
+from collections import deque
+from io import BytesIO
+
+import six
+
+
+class BufferReader(object):
+    """Reads a bytes-like object (bytes, bytearray, mmap...) without copying
+    more than a chunk of it at a time."""
+
+    def __init__(self, buf):
+        self.view = memoryview(buf)
+        self.pos = 0
+
+    def __len__(self):
+        return self.view.nbytes - self.pos
+
+    def read(self, size=-1):
+        end = len(self.view) if size is None or size < 0 else self.pos + size
+        chunk = self.view[self.pos:end].tobytes()
+        self.pos += len(chunk)
+        return chunk
+
+
+def remaining(fileobj):
+    """Return the number of bytes left to read from fileobj."""
+    try:
+        return os.fstat(fileobj.fileno()).st_size - fileobj.tell()
+    except (AttributeError, OSError, IOError, ValueError):
+        pos = fileobj.tell()
+        fileobj.seek(0, os.SEEK_END)
+        end = fileobj.tell()
+        fileobj.seek(pos)
+        return end - pos
+
+
+class MultipartBody(object):
+    """
+    A multipart/form-data request body holding one file, under the form
+    field 'file'.  source is an open binary file, which is read from its
+    current position, a bytes-like object such as an mmap, or text, which is
+    sent as UTF-8.  The body has a known length, so it's sent with a
+    Content-Length rather than chunked, and is read from source a block at a
+    time as it's sent.
+    """
+
+    def __init__(self, filename, source, field='file'):
+        if isinstance(source, six.text_type):
+            source = source.encode('utf-8')
+        try:
+            # Bytes-like objects, including mmaps, are sent whole.
+            source = BufferReader(source)
+            size = len(source)
+        except TypeError:
+            size = remaining(source)
+
+        # Imported here, as they're slow to import and uploads are rare.
+        import mimetypes
+        import uuid
+        boundary = uuid.uuid4().hex
+        mimetype = mimetypes.guess_type(filename)[0] or \
+            'application/octet-stream'
+        head = ('--%s\r\n'
+                'Content-Disposition: form-data; name="%s"; filename="%s"\r\n'
+                'Content-Type: %s\r\n\r\n' % (
+                    boundary, field, filename.replace('"', '%22'),
+                    mimetype)).encode('utf-8')
+        tail = ('\r\n--%s--\r\n' % boundary).encode('ascii')
+
+        self.content_type = 'multipart/form-data; boundary=%s' % boundary
+        self.length = len(head) + size + len(tail)
+        self.parts = deque([BytesIO(head), source, BytesIO(tail)])
+
+    def __len__(self):
+        return self.length
+
+    def read(self, size=-1):
+        chunks = []
+        wanted = size
+        while self.parts and (size is None or size < 0 or wanted > 0):
+            chunk = self.parts[0].read(wanted if wanted > 0 else -1)
+            if not chunk:
+                self.parts.popleft()
+                continue
+            chunks.append(chunk)
+            wanted -= len(chunk)
+        return b''.join(chunks)
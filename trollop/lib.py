@@ -1,14 +1,31 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import json
-import isodate
 import datetime
+import functools
+import os
+import sys
+import threading
+import time
+import weakref
+from collections import deque, namedtuple
 
 import six
-from six.moves.urllib.parse import urlencode
+from six.moves.urllib.parse import urlencode, urlparse
 
-import requests
+# requests, isodate, json and concurrent.futures take far longer to import
+# than the rest of trollop, so they're imported where they're first needed:
+# requests on the first request, isodate on the first date not in Trello's
+# own format.
+
+from .cache import Cache, MISSING
+from .files import MultipartBody
+from . import parsing
+from .ratelimit import RateLimiter
+from .stats import Stats, RequestEvent, current_trigger, triggered_by
+
+# The most objects Trello returns from one request for a list of them.
+MAX_LIMIT = 1000
 
 
 def get_class(str_or_class):
@@ -20,23 +37,274 @@ def get_class(str_or_class):
         return str_or_class
 
 
+def get_descriptor(cls, name):
+    """Look up a Field or SubList declared on cls or its bases, without
+    invoking it."""
+    for klass in cls.__mro__:
+        if name in klass.__dict__:
+            return klass.__dict__[name]
+    return None
+
+
+try:
+    UTC = datetime.timezone.utc
+except AttributeError:
+    # Python 2 has no datetime.timezone.
+    class Utc(datetime.tzinfo):
+        def utcoffset(self, dt):
+            return datetime.timedelta(0)
+
+        def tzname(self, dt):
+            return 'UTC'
+
+        def dst(self, dt):
+            return datetime.timedelta(0)
+
+    UTC = Utc()
+
+
+def parse_date(value):
+    """
+    Parse a Trello date string into a timezone-aware datetime, or return
+    None for None.  Trello's own format, like 2024-01-02T03:04:05.678Z, is
+    picked apart directly; anything else is left to isodate.
+    """
+    if value is None:
+        return None
+    if (len(value) == 24 and value[10] == 'T' and value[19] == '.' and
+            value[23] == 'Z'):
+        try:
+            return datetime.datetime(
+                int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                int(value[11:13]), int(value[14:16]), int(value[17:19]),
+                int(value[20:23]) * 1000, UTC)
+        except ValueError:
+            pass
+    import isodate
+    return isodate.parse_datetime(value)
+
+
+def decode_fields(cls, objs, docs):
+    """
+    Decode the typed fields (like dates) of many cls objects at once, from
+    their docs, and memoize the values on the objects.  Each distinct raw
+    value is only decoded once.
+    """
+    for field in cls._typed_fields:
+        key = field.key
+        decoded = {}
+        for obj, doc in zip(objs, docs):
+            if key not in doc:
+                continue
+            raw = doc[key]
+            try:
+                value = decoded[raw]
+            except KeyError:
+                value = decoded[raw] = field.decode(raw)
+            field.memoize(obj, raw, value)
+
+
+def to_cursor(value):
+    """Format a date or id for Trello's since and before params."""
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    return value
+
+
+def projection(fields):
+    """Return the params that ask Trello for only the given fields."""
+    return {'fields': ','.join(fields)}
+
+
+def bulk_result(op, future):
+    try:
+        return BulkResult(op, future.result(), None)
+    except Exception as e:
+        return BulkResult(op, None, e)
+
+
+def data_trigger(obj):
+    """
+    Name the Field whose access is making obj fetch its data, like
+    'Card.name', by looking for it on the stack.  Only called when about to
+    make a request, so the cost doesn't matter.
+    """
+    frame = sys._getframe(1)
+    for i in range(6):
+        if frame is None:
+            break
+        field = frame.f_locals.get('self')
+        if isinstance(field, Field):
+            return '%s.%s' % (type(obj).__name__, field.key)
+        frame = frame.f_back
+    return '%s._data' % type(obj).__name__
+
+
+def local_data(obj):
+    """
+    Return the data kept on obj itself rather than in its connection's cache
+    (as for objects streamed by SubList.iterate), or None.
+    """
+    try:
+        # Bypass __getattr__, which would look in the cache.
+        return object.__getattribute__(obj, '_data')
+    except AttributeError:
+        return None
+
+
+def cached_position(obj):
+    """
+    Return obj's pos, for sorting sublists, from its data if it's cached,
+    without fetching it if it isn't.  Uncached objects sort first.
+    """
+    data = local_data(obj)
+    if data is None and obj._conn is not None:
+        data = obj._conn.cache.get(obj._path)
+    return (data or {}).get('pos', 0)
+
+
+def compact_data(cls, data):
+    """Return data with only the keys that cls declares Fields for."""
+    keys = cls._field_keys
+    return dict((k, v) for k, v in data.items() if k in keys)
+
+
+def find_sublist(cls, child_cls):
+    """Return the first SubList on cls that lists child_cls objects, or
+    None."""
+    for name in dir(cls):
+        sublist = get_descriptor(cls, name)
+        if isinstance(sublist, SubList) and get_class(sublist.cls) is child_cls:
+            return sublist
+    return None
+
+
+def get_sublist(cls, name):
+    """Return the SubList called name on cls, or raise ValueError."""
+    sublist = get_descriptor(cls, name)
+    if not isinstance(sublist, SubList):
+        raise ValueError("%s objects have no sublist %r" % (cls.__name__, name))
+    return sublist
+
+
+def implied_names(cls, names):
+    """
+    Return the names prefetched on a cls object along with those they imply:
+    a dotted name like 'cards.members' implies 'cards', and a name implies
+    whatever else its query params nest in the response, like the cards
+    that 'lists.cards' makes Trello return beside the lists.
+    """
+    implied = list(names)
+    for name in names:
+        if '.' in name:
+            implied.append(name.split('.', 1)[0])
+        implied.extend(key for key in cls._nested.get(name, ())
+                       if key in cls._nested)
+    return sorted(set(implied), key=implied.index)
+
+
+# The outcome of one operation run by TrelloConnection.bulk: the operation,
+# and either what it returned or the exception it raised.
+BulkResult = namedtuple('BulkResult', ['op', 'result', 'error'])
+
+
 class TrelloConnection(object):
 
-    def __init__(self, api_key, oauth_token):
-        self.session = requests.session()
+    # Trello's /batch endpoint accepts at most this many urls per call.
+    batch_size = 10
+
+    # Whether to decode the typed fields (like dates) of all the objects in a
+    # sublist when it's fetched, parsing each distinct value once, rather
+    # than as each one is read.
+    decode_sublists = False
+
+    def __init__(self, api_key, oauth_token, cache=None, limiter=None,
+                 workers=8, store=None, api_url='https://api.trello.com/1',
+                 loads=None):
+        self._session = None
+        self.api_url = api_url
+
+        # Parses JSON responses, from their bytes.  Defaults to orjson if
+        # it's installed, or the json module.
+        self.loads = loads or parsing.loads
+
+        # Requests made through get_async and map_load run on a pool of this
+        # many threads, created on first use.  The HTTP connection pool is
+        # sized to match (see session).
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+        # Held while changing cached sublists, which bulk operations' threads
+        # may add to at once.
+        self._sublist_lock = threading.RLock()
 
         self.key = api_key
         self.token = oauth_token
 
+        # Fetched object data and sublists are cached per connection.  Pass
+        # your own Cache to control its size and expiry.
+        self.cache = cache if cache is not None else Cache()
+
+        # Requests are paced to stay under Trello's rate limits, and retried
+        # when throttled.  Pass your own RateLimiter to tune this.
+        self.limiter = limiter if limiter is not None else RateLimiter()
+
+        # Optionally, fetched data is also persisted (say in a SQLiteStore),
+        # so that later processes can start warm.
+        self.store = store
+
+        # Metrics for every request made, and functions to call with a
+        # RequestEvent after each one.  See add_hook.
+        self.stats = Stats()
+        self.hooks = []
+
+        # Objects with changes not yet saved, by path.  Held strongly so that
+        # the changes aren't lost before flush() is called.
+        self._dirty = {}
+
+        # Identity map of live objects, by (class, id), so that each Trello
+        # object is represented by at most one instance per connection.
+        self._objects = weakref.WeakValueDictionary()
+
+        # Indexes for querying boards' cached cards, by board id.  See
+        # Board.query.
+        self._indexes = {}
+
+        # The ETag and Last-Modified headers of full GETs, by path, to make
+        # conditional requests with.  See refresh.
+        self.validators = Cache()
+
+        # Futures for the GETs in progress, so that concurrent identical ones
+        # can share a single request.  See _single_flight.
+        self._in_flight = {}
+
+        # Keys that objects' data, by path, was found not to have when they
+        # were fetched on their own.  See LazyTrello._load_field.
+        self._missing = Cache(max_size=self.cache.max_size)
+
     def request(self, method, path, params=None, body=None, filename=None):
+        return self._send(method, path, params, body, filename).text
 
+    def _url(self, path, params=None):
+        """Return the normalized path, and the full URL to request it."""
         if not path.startswith('/'):
             path = '/' + path
-        url = 'https://api.trello.com/1' + path
+        params = dict(params or {})
+        params.setdefault('limit', MAX_LIMIT)
+        params.update({'key': self.key, 'token': self.token})
+        return path, self.api_url + path + u'?' + urlencode(params)
 
-        params = params or {}
-        params.update({'key': self.key, 'token': self.token, 'limit': 1000})
-        url += u'?' + urlencode(params)
+    def _send(self, method, path, params=None, body=None, filename=None,
+              headers=None):
+        """
+        Make a request, with any extra headers given, and return the
+        response.  Raises for error statuses.
+        """
+        # Only responses for whole objects or sublists are worth validating
+        # later, not projections.
+        validate = method == 'GET' and not params
+        extra_headers = headers
+        path, url = self._url(path, params)
 
         # Trello recently got picky about headers.  Only set content type if
         # we're submitting a payload in the body
@@ -51,15 +319,137 @@ class TrelloConnection(object):
         else:
           headers = None
         if namedFile:
-          response = requests.post(url, files=dict(file=namedFile))
-        else:
-          response = self.session.request(method, url, data=body, headers=headers)
+          # Streamed from the file (or buffer) as it's sent, over the pooled
+          # session.
+          body = MultipartBody(*namedFile)
+          headers = {'Content-Type': body.content_type}
+        if extra_headers:
+            headers = dict(headers or {}, **extra_headers)
+
+        attempt = 0
+        response = None
+        start = time.time()
+        try:
+            while True:
+                self.limiter.acquire()
+                response = self.session.request(method, url, data=body, headers=headers)
+                self.limiter.update(response)
+                # An upload can't be resent once its file has been read.
+                if namedFile or not self.limiter.should_retry(method, response,
+                                                              attempt):
+                    break
+                self.limiter.retry(response, attempt)
+                attempt += 1
+        finally:
+            self._record(method, path, url, body, response, start, attempt + 1)
         # print("method: {}, url: {}, data: {}, headers: {}".format(method, url, body, headers))
         response.raise_for_status()
-        return response.text
+        if validate and response.status_code == 200:
+            validator = (response.headers.get('ETag'),
+                         response.headers.get('Last-Modified'))
+            if validator != (None, None):
+                self.validators.set(path, validator)
+        return response
+
+    def _record(self, method, path, url, body, response, start, attempts,
+                received=None):
+        trigger, location = current_trigger()
+        sent = len(url)
+        if isinstance(body, (six.binary_type, six.text_type, MultipartBody)):
+            sent += len(body)
+        if received is None:
+            received = len(response.content) if response is not None else 0
+        event = RequestEvent(
+            method, path,
+            status=response.status_code if response is not None else None,
+            start=start, end=time.time(), bytes_sent=sent,
+            bytes_received=received,
+            attempts=attempts, trigger=trigger, location=location)
+        self.stats.record(event)
+        for hook in self.hooks:
+            hook(event)
+
+    def add_hook(self, hook):
+        """
+        Call hook with a RequestEvent (see trollop.stats) after every request
+        this connection makes.
+        """
+        self.hooks.append(hook)
+
+    def metrics(self):
+        """
+        Return a snapshot of the connection's request, cache and rate limit
+        metrics.
+        """
+        return {'requests': self.stats.snapshot(),
+                'cache': self.cache.stats(),
+                'limiter': self.limiter.stats()}
+
+    def decode(self, content, path):
+        """
+        Parse a JSON response for path, from its bytes (or text), timing it
+        in the stats.
+        """
+        start = time.time()
+        data = self.loads(content)
+        self.stats.record_decode(path, time.time() - start)
+        return data
+
+    # These parse the response bytes directly, skipping the decoding to text
+    # that the methods returning text do.
+
+    def get_json(self, path, params=None):
+        return self._single_flight(
+            'json', path, params,
+            lambda: self.decode(self._send('GET', path, params).content, path))
+
+    def post_json(self, path, params=None, body=None):
+        return self.decode(self._send('POST', path, params, body).content, path)
+
+    def put_json(self, path, params=None, body=None):
+        return self.decode(self._send('PUT', path, params, body).content, path)
+
+    def iter_json(self, path, params=None, chunk_size=65536):
+        """
+        Yield the items of the JSON list at path one at a time, each parsed
+        as soon as it has arrived, so that a large list is never held in
+        memory whole, as bytes or as objects.
+        """
+        path, url = self._url(path, params)
+        return parsing.iter_items(self._stream(url, path, None, chunk_size))
 
     def get(self, path, params=None):
-        return self.request('GET', path, params)
+        return self._single_flight(
+            'text', path, params,
+            lambda: self.request('GET', path, params))
+
+    def _single_flight(self, kind, path, params, call):
+        """
+        Return call(), unless an identical call (for the same kind of result,
+        path and params) is already in progress on another thread, in which
+        case wait for it and share its result, or its exception.
+        """
+        key = (kind, path, tuple(sorted((params or {}).items())))
+        with self._lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                from concurrent.futures import Future
+                future = self._in_flight[key] = Future()
+        if not leader:
+            self.stats.record_shared(path)
+            return future.result()
+        try:
+            result = call()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
 
     def post(self, path, params=None, body=None):
         return self.request('POST', path, params, body)
@@ -70,26 +460,532 @@ class TrelloConnection(object):
     def delete(self, path, params=None, body=None):
         return self.request('DELETE', path, params, body)
 
-    def get_board(self, board_id):
-        return Board(self, board_id)
+    def iter_content(self, url, chunk_size=65536):
+        """
+        Yield the content at url, like an attachment's, in chunks of at most
+        chunk_size bytes, over the connection's pooled session and without
+        holding it all in memory.  URLs on Trello itself are sent the
+        connection's credentials.
+        """
+        headers = None
+        if urlparse(url).hostname in ('trello.com', 'api.trello.com'):
+            headers = {'Authorization':
+                       'OAuth oauth_consumer_key="%s", oauth_token="%s"' %
+                       (self.key, self.token)}
+        return self._stream(url, urlparse(url).path, headers, chunk_size)
+
+    def _stream(self, url, path, headers, chunk_size):
+        """
+        GET url and yield its content in chunks as it arrives, retrying if
+        throttled before any has.
+        """
+        attempt = 0
+        start = time.time()
+        received = 0
+        response = None
+        try:
+            while True:
+                self.limiter.acquire()
+                response = self.session.request('GET', url, headers=headers,
+                                                stream=True)
+                self.limiter.update(response)
+                if not self.limiter.should_retry('GET', response, attempt):
+                    break
+                response.close()
+                self.limiter.retry(response, attempt)
+                attempt += 1
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size):
+                received += len(chunk)
+                yield chunk
+        finally:
+            if response is not None:
+                response.close()
+            self._record('GET', path, url, None, response, start,
+                         attempt + 1, received)
+
+    @property
+    def session(self):
+        """
+        The requests Session used for every request, created (and requests
+        imported) on first use.  Its connection pool holds as many
+        connections as there are worker threads, so that they don't queue up
+        for connections.
+        """
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.session()
+                adapter = HTTPAdapter(pool_connections=self.workers,
+                                      pool_maxsize=self.workers)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._session = session
+            return self._session
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._executor = ThreadPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def close(self):
+        """
+        Shut down the thread pool, if one was started, and the HTTP session.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._session is not None:
+            self._session.close()
+
+    def get_async(self, path, params=None):
+        """
+        Like get, but runs on the connection's thread pool and returns a
+        Future for the response text.
+        """
+        return self.executor.submit(self.get, path, params)
+
+    def map_load(self, objs):
+        """
+        Load the data for many Trello objects in parallel on the connection's
+        thread pool.  Objects whose data is already cached are skipped.
+        Returns the objects once they're all loaded, or raises the first
+        error encountered.
+        """
+        objs = list(objs)
+        futures = {}
+        for obj in objs:
+            if obj._path not in futures and obj._path not in self.cache:
+                futures[obj._path] = self.executor.submit(obj._fetch)
+        for future in futures.values():
+            future.result()
+        return objs
+
+    def load(self, obj, fields=None):
+        """
+        Fetch a Trello object's data and cache it, replacing any data cached
+        already.  If fields is given, only those fields are fetched, and
+        merged into any data cached already.  Returns the object.
+        """
+        return self._load_sync(obj, fields)
+
+    def _load_sync(self, obj, fields=None):
+        # load, for the lazy loads made from plain attribute access, which
+        # block even on an AsyncTrelloConnection (whose load is a coroutine).
+        if fields:
+            data = self.get_json(obj._path, projection(fields))
+            self.merge(obj._path, data)
+        else:
+            obj._fetch()
+        return obj
 
-    def get_card(self, card_id):
-        return Card(self, card_id)
+    def fetch_sublist(self, obj, name, fields=None):
+        """
+        Fetch the sublist called name (like 'cards') on a Trello object and
+        cache it, replacing any list cached already.  If fields is given,
+        only those fields of the child objects are fetched.  Returns the
+        list.
+        """
+        sublist = get_sublist(type(obj), name)
+        params = projection(fields) if fields else None
+        data = self.get_json(sublist.path(obj), params)
+        return sublist.fill(obj, data, partial=bool(fields))
 
-    def get_list(self, list_id):
-        return List(self, list_id)
+    def bulk(self, ops, window=None):
+        """
+        Run many operations, each a callable taking no arguments, on the
+        connection's thread pool.  At most window of them (by default twice
+        the number of workers) are in flight at once, and every request
+        still goes through the rate limiter.
+
+        This is a generator: it consumes ops lazily, and yields a BulkResult
+        for each one, in order, as they finish.  An operation that raises
+        doesn't stop the others; its exception is reported in its result.
+        """
+        window = window or self.workers * 2
+        pending = deque()
+        for op in ops:
+            pending.append((op, self.executor.submit(op)))
+            if len(pending) >= window:
+                yield bulk_result(*pending.popleft())
+        while pending:
+            yield bulk_result(*pending.popleft())
+
+    def fetch_many(self, objs):
+        """
+        Load the data for many Trello objects in as few requests as possible,
+        by grouping them into calls to Trello's /batch endpoint.  Objects
+        whose data is already cached are skipped.  Returns the objects.
+        """
+        objs = list(objs)
+        pending = []
+        seen = set()
+        for obj in objs:
+            if obj._path in seen or obj._path in self.cache:
+                continue
+            seen.add(obj._path)
+            pending.append(obj)
+
+        for i in range(0, len(pending), self.batch_size):
+            chunk = pending[i:i + self.batch_size]
+            urls = ','.join(obj._path for obj in chunk)
+            results = self.get_json('/batch', {'urls': urls})
+            # Each result is like {"200": {...}} on success.  Anything else
+            # is left uncached, to fail normally if it's accessed later.
+            for obj, result in zip(chunk, results):
+                if '200' in result:
+                    self.remember(obj._path, result['200'])
+        return objs
+
+    def remember(self, path, value, data=None):
+        """
+        Cache value under path, and persist data (the JSON that value was
+        made from, which defaults to value itself) if there's a store.  If
+        value is a sublist, data is its objects' documents, and the cache
+        entry holds them too, so that they're evicted together.
+        """
+        children = None
+        if isinstance(value, list) and isinstance(data, list):
+            children = [(obj._path, d) for obj, d in zip(value, data)]
+        self.cache.set(path, value, children=children)
+        self._missing.invalidate(path)
+        if self.store is not None:
+            self.store.set(path, value if data is None else data)
+
+    def merge(self, path, data):
+        """
+        Merge a partial document, fetched with only some fields, into the
+        cached data for path, or cache it as it is if there's none.  Returns
+        the merged data.
+        """
+        cached = self.cache.get(path)
+        if cached is None:
+            cached = data
+        else:
+            cached.update(data)
+        self.remember(path, cached)
+        return cached
 
-    def get_checklist(self, checklist_id):
-        return Checklist(self, checklist_id)
+    def update_object(self, obj, data, partial=False):
+        """
+        Merge new data for obj into its cached data in place, and move obj
+        between the cached sublists of its parents (like a card between
+        lists) if the change calls for it.  If partial is true, data only
+        has some fields, and is ignored when obj has nothing cached.
+        """
+        local = local_data(obj)
+        if local is not None:
+            local.update(data)
+            return
+        cached = self.cache.get(obj._path)
+        if cached is None and partial:
+            return
+        before = dict(cached or {})
+        after = self.merge(obj._path, data)
+        self._relocate(obj, before, after)
+
+    def _parent_sublists(self, obj, data):
+        """
+        Yield (key, parent class, sublist) for the keys of obj's data, like
+        idList and idBoard, that refer to the objects whose sublists obj may
+        appear in.
+        """
+        for key in data:
+            parent_cls = globals().get(key[2:]) if key.startswith('id') else None
+            if not (isinstance(parent_cls, type) and
+                    issubclass(parent_cls, LazyTrello)):
+                continue
+            sublist = find_sublist(parent_cls, type(obj))
+            if sublist is not None:
+                yield key, parent_cls, sublist
+
+    def _relocate(self, obj, before, after):
+        for key, parent_cls, sublist in self._parent_sublists(obj, after):
+            old_id, new_id = before.get(key), after.get(key)
+            moved = old_id != new_id
+            reopened = before.get('closed') and not after.get('closed')
+
+            if old_id and (moved or after.get('closed')):
+                parent = self.get_object(parent_cls, old_id)
+                with self._sublist_lock:
+                    objs = self.cache.get(sublist.path(parent))
+                    if objs is not None and obj in objs:
+                        objs.remove(obj)
+            if new_id and (moved or reopened) and not after.get('closed'):
+                parent = self.get_object(parent_cls, new_id)
+                self._insert(sublist.path(parent), [obj])
+
+    def _insert(self, path, new):
+        """
+        Add the objects in new to the sublist cached under path, if there is
+        one, keeping it in position order.  It's sorted at most once, however
+        many are added.
+        """
+        pos = cached_position
+        with self._sublist_lock:
+            objs = self.cache.get(path)
+            if objs is None:
+                return
+            present = set(o._id for o in objs)
+            new = [o for o in new if o._id not in present]
+            if not new:
+                return
+            # Cards are usually added at the bottom, so avoid sorting when
+            # appending keeps the order.
+            tail = objs[-1:] + new
+            in_order = all(pos(a) <= pos(b) for a, b in zip(tail, tail[1:]))
+            objs.extend(new)
+            if not in_order:
+                objs.sort(key=pos)
+
+    def add_created(self, objs):
+        """
+        Add newly created objects, whose data is cached, to the cached
+        sublists of their parents (like a list's and its board's cards),
+        sorting each sublist once.
+        """
+        groups = {}
+        for obj in objs:
+            data = self.cache.get(obj._path)
+            if data is None or data.get('closed'):
+                continue
+            for key, parent_cls, sublist in self._parent_sublists(obj, data):
+                if data.get(key):
+                    parent = self.get_object(parent_cls, data[key])
+                    groups.setdefault(sublist.path(parent), []).append(obj)
+        for path, new in groups.items():
+            self._insert(path, new)
+
+    def flush(self):
+        """
+        Save every object on this connection that has unsaved changes.
+        """
+        with self._lock:
+            dirty = list(self._dirty.values())
+        for obj in dirty:
+            obj.save()
 
-    def get_member(self, member_id):
-        return Member(self, member_id)
+    def recall(self, path):
+        """
+        Return the persisted JSON for path if there's a store and it has a
+        fresh copy, or MISSING.
+        """
+        if self.store is None:
+            return MISSING
+        return self.store.get(path, MISSING)
 
-    def get_notification(self, not_id):
-        return Notification(self, not_id)
+    def forget(self, path):
+        """
+        Drop whatever is cached, and persisted, for path, so that it's
+        fetched fresh on next access.
+        """
+        self.cache.invalidate(path)
+        self._missing.invalidate(path)
+        if self.store is not None:
+            self.store.delete(path)
 
-    def get_organization(self, org_id):
-        return Organization(self, org_id)
+    def invalidate(self, obj):
+        """
+        Drop the cached data for a Trello object, along with any sublists
+        cached under it, so that they'll be fetched fresh on next access.
+        """
+        self.cache.invalidate(obj._path)
+        self.cache.invalidate_prefix(obj._path + '/')
+        if self.store is not None:
+            self.store.delete(obj._path)
+            self.store.delete_prefix(obj._path + '/')
+
+    def conditional_get(self, path):
+        """
+        GET path, sending the validators (ETag and Last-Modified) remembered
+        from the last full GET of it, if there are any.  Returns the parsed
+        JSON, or MISSING if Trello says it hasn't changed.
+        """
+        etag, modified = self.validators.get(path, (None, None))
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if modified:
+            headers['If-Modified-Since'] = modified
+        response = self._send('GET', path, headers=headers)
+        if response.status_code == 304:
+            return MISSING
+        return self.decode(response.content, path)
+
+    def refresh(self, objs):
+        """
+        Bring the cached data of objs up to date as cheaply as possible.
+        Returns the objects that had changed, or had nothing cached.
+
+        Boards and cards carry a dateLastActivity, so only that is fetched
+        for them, in batches, and the cached copy is kept, along with the
+        sublists cached under it, if it hasn't moved on.  Other objects are
+        fetched with a conditional request if their last response had an
+        ETag or Last-Modified header.  Copies in the store are revalidated
+        the same way, even once they're stale, rather than downloaded again.
+        """
+        changed = []
+        missing = []
+        by_activity = []
+        for obj in objs:
+            data = self._local_copy(obj._path)
+            if data is MISSING:
+                missing.append(obj)
+            elif data.get('dateLastActivity'):
+                by_activity.append((obj, data))
+            else:
+                latest = self.conditional_get(obj._path)
+                if latest is MISSING:
+                    self.remember(obj._path, data)
+                else:
+                    self.remember(obj._path, latest)
+                    if latest != data:
+                        changed.append(obj)
+
+        stale = []
+        for i in range(0, len(by_activity), self.batch_size):
+            chunk = by_activity[i:i + self.batch_size]
+            urls = ','.join(obj._path + '?fields=dateLastActivity'
+                            for obj, data in chunk)
+            results = self.get_json('/batch', {'urls': urls})
+            for (obj, data), result in zip(chunk, results):
+                latest = result.get('200', {}).get('dateLastActivity')
+                if latest is not None and latest == data['dateLastActivity']:
+                    self.remember(obj._path, data)
+                else:
+                    # Something in or under obj has changed.
+                    self.invalidate(obj)
+                    stale.append(obj)
+
+        self.fetch_many(missing + stale)
+        return changed + missing + stale
+
+    def refresh_sublist(self, obj, name):
+        """
+        Bring the cached sublist of obj called name up to date, with a
+        conditional request if its last response had an ETag or
+        Last-Modified header.  Returns whether it had changed.
+        """
+        sublist = get_sublist(type(obj), name)
+        path = sublist.path(obj)
+        cached = self.cache.get(path, MISSING)
+        if cached is not MISSING and path in self.validators:
+            data = self.conditional_get(path)
+            if data is MISSING:
+                self.cache.set(path, cached)
+                return False
+        else:
+            data = self.get_json(path)
+        sublist.fill(obj, data)
+        return True
+
+    def _local_copy(self, path):
+        """
+        Return the cached data for path, or else the stored data, however
+        old, or MISSING.
+        """
+        data = self.cache.get(path, MISSING)
+        if data is MISSING and self.store is not None:
+            get_entry = getattr(self.store, 'get_entry', None)
+            if get_entry is None:
+                return self.store.get(path, MISSING)
+            entry = get_entry(path)
+            if entry is not None:
+                data = entry[0]
+        return data
+
+    def board_index(self, board):
+        """
+        Return the BoardIndex of board's cached cards, building it (and
+        fetching the cards if need be) the first time.
+        """
+        from .query import BoardIndex
+        index = self._indexes.get(board._id)
+        if index is None:
+            index = BoardIndex(board)
+            with self._lock:
+                if board._id in self._indexes:
+                    index.close()
+                index = self._indexes.setdefault(board._id, index)
+        return index
+
+    def get_object(self, cls, obj_id, data=None):
+        """
+        Return the instance of cls (a class or class name) for obj_id on this
+        connection, creating it if there isn't a live one already.  If data is
+        passed, it replaces whatever data was cached for the object.
+        """
+        cls = get_class(cls)
+        key = (cls, obj_id)
+        with self._lock:
+            obj = self._objects.get(key)
+            if obj is None:
+                obj = cls(self, obj_id, data)
+                self._objects[key] = obj
+                return obj
+        if data:
+            self.cache.set(obj._path, data)
+        return obj
+
+    def _get(self, cls, obj_id, prefetch=None, fields=None):
+        # Objects are lazy, unless asked to prefetch related objects or to
+        # load only certain fields.
+        obj = self.get_object(cls, obj_id)
+        if prefetch:
+            obj.prefetch(*prefetch, fields=fields)
+        elif fields:
+            self._load_sync(obj, fields)
+        return obj
+
+    def get_board(self, board_id, prefetch=None, fields=None):
+        return self._get(Board, board_id, prefetch, fields)
+
+    def get_card(self, card_id, prefetch=None, fields=None):
+        return self._get(Card, card_id, prefetch, fields)
+
+    def get_list(self, list_id, prefetch=None, fields=None):
+        return self._get(List, list_id, prefetch, fields)
+
+    def get_checklist(self, checklist_id, fields=None):
+        return self._get(Checklist, checklist_id, fields=fields)
+
+    def get_member(self, member_id, fields=None):
+        return self._get(Member, member_id, fields=fields)
+
+    def get_notification(self, not_id, fields=None):
+        return self._get(Notification, not_id, fields=fields)
+
+    def get_organization(self, org_id, fields=None):
+        return self._get(Organization, org_id, fields=fields)
+
+    def get_webhook(self, webhook_id, fields=None):
+        return self._get(Webhook, webhook_id, fields=fields)
+
+    def get_webhooks(self):
+        """
+        Return the Webhooks registered with this connection's token.
+        """
+        path = '/tokens/%s/webhooks' % self.token
+        return [self.get_object(Webhook, d['id'], d)
+                for d in self.get_json(path)]
+
+    def create_webhook(self, model, callback_url, description=None):
+        """
+        Ask Trello to POST the actions on model (a Trello object, or its id)
+        to callback_url, and return the new Webhook.  Trello first checks
+        that callback_url answers a HEAD request.  See trollop.webhooks for
+        a receiver that applies the actions to the cache.
+        """
+        params = {'idModel': getattr(model, '_id', model),
+                  'callbackURL': callback_url}
+        if description is not None:
+            params['description'] = description
+        data = self.post_json(Webhook._prefix, params=params)
+        return self.get_object(Webhook, data['id'], data)
 
     @property
     def me(self):
@@ -97,23 +993,28 @@ class TrelloConnection(object):
         Return a Membership object for the user whose credentials were used to
         connect.
         """
-        return Member(self, 'me')
+        return self.get_object(Member, 'me')
 
 
 class Closable(object):
     """
     Mixin for Trello objects for which you're allowed to PUT to <id>/closed.
     """
+    __slots__ = ()
+
     def close(self):
         path = self._prefix + self._id + '/closed'
         params = {'value': 'true'}
         result = self._conn.put(path, params=params)
+        self._conn.update_object(self, {'closed': True}, partial=True)
 
 
 class Deletable(object):
     """
     Mixin for Trello objects which are allowed to be DELETEd.
     """
+    __slots__ = ()
+
     def delete(self):
         path = self._prefix + self._id
         self._conn.delete(path)
@@ -123,6 +1024,7 @@ class Labeled(object):
     """
     Mixin for Trello objects which have labels.
     """
+    __slots__ = ()
 
     # TODO: instead of set_label and get_label, just override the 'labels'
     #  property to call set and get as appropriate.
@@ -143,6 +1045,7 @@ class Labeled(object):
         path = self._prefix + self._id + '/labels'
         params = {'value': color}
         self._conn.post(path, params=params)
+        self._labels_changed()
 
     def clear_label(self, color):
         color = color.lower()
@@ -150,54 +1053,154 @@ class Labeled(object):
             raise ValueError("invalid color")
         path = self._prefix + self._id + '/labels/' + color
         self._conn.delete(path)
+        self._labels_changed()
+
+    def _labels_changed(self):
+        # Which label was added or removed isn't known locally, so drop the
+        # cached data and labels to have them fetched again.
+        self._conn.forget(self._path)
+        self._conn.forget(self._path + Label._prefix)
+
+
+class Actionable(object):
+    """
+    Mixin for Trello objects with an actions sublist, which may be too long to
+    fetch in one go.
+    """
+    __slots__ = ()
+
+    def iter_actions(self, since=None, before=None, page_size=1000,
+                     prefetch=False):
+        """
+        Yield this object's actions, newest first, fetching them a page at a
+        time.  since and before may be dates or action ids.  See
+        LazyTrello.iter_sublist.
+        """
+        return self.iter_sublist('actions', since=since, before=before,
+                                 page_size=page_size, prefetch=prefetch)
 
 
 class Field(object):
     """
     A simple field on a Trello object.  Maps the attribute to a key in the
     object's _data dict.
+
+    Writable fields may be assigned to.  The change is kept on the object
+    until its save() method (or the connection's flush()) sends it to Trello.
     """
 
-    def __init__(self, key=None):
+    def __init__(self, key=None, writable=False):
         self.key = key
+        self.writable = writable
 
     def __get__(self, instance, owner):
         # Accessing instance._data will trigger a fetch from Trello if the
         # _data attribute isn't already present.
-        return instance._data[self.key]
+        return self.raw(instance)
+
+    def __set__(self, instance, value):
+        if not self.writable:
+            raise AttributeError("%s.%s is read only" %
+                                 (type(instance).__name__, self.key))
+        instance._change(self.key, self.encode(value))
+
+    def encode(self, value):
+        """Convert a value assigned to the field to its JSON form."""
+        return value
+
+    def decode(self, raw):
+        """
+        Convert the field's JSON value to the value read from it.  Fields that
+        override this are decoded once and memoized; see decoded().
+        """
+        return raw
+
+    def decoded(self, instance):
+        """
+        Return the decoded value of this field on instance.  The value is
+        memoized on the instance along with the raw value it came from, so
+        it's decoded again only when the raw value is replaced, by a fetch,
+        a save or an unsaved change.
+        """
+        raw = self.raw(instance)
+        memo = instance._decoded
+        if memo is not None:
+            entry = memo.get(self.key)
+            if entry is not None and entry[0] is raw:
+                return entry[1]
+        value = self.decode(raw)
+        self.memoize(instance, raw, value)
+        return value
+
+    def memoize(self, instance, raw, value):
+        memo = instance._decoded
+        if memo is None:
+            memo = instance._decoded = {}
+        memo[self.key] = (raw, value)
+
+    def raw(self, instance):
+        changes = instance._changes
+        if changes and self.key in changes:
+            return changes[self.key]
+        try:
+            return instance._data[self.key]
+        except KeyError:
+            # The data may have been fetched with only some fields.  Fetch
+            # this one and try again.
+            with triggered_by('%s.%s' % (type(instance).__name__, self.key)):
+                return instance._load_field(self.key)[self.key]
 
 
 class DateField(Field):
     def __get__(self, instance, owner):
-        raw = super(DateField, self).__get__(instance, owner)
-        return isodate.parse_datetime(raw)
+        return self.decoded(instance)
+
+    def decode(self, raw):
+        return parse_date(raw)
+
+    def encode(self, value):
+        if isinstance(value, (datetime.date, datetime.datetime)):
+            return value.isoformat()
+        return value
 
 class IntField(Field):
     def __get__(self, instance, owner):
-        raw = super(IntField, self).__get__(instance, owner)
+        return self.decoded(instance)
+
+    def decode(self, raw):
         return int(raw)
 
 class BoolField(Field):
     def __get__(self, instance, owner):
-        raw = super(BoolField, self).__get__(instance, owner)
+        return self.decoded(instance)
+
+    def decode(self, raw):
         return bool(raw)
 
+    def encode(self, value):
+        return bool(value)
+
 
 class ObjectField(Field):
     """
     Maps an idSomething string attr on an object to another object type.
     """
 
-    def __init__(self, key, cls):
+    def __init__(self, key, cls, writable=False):
 
         self.key = key
         self.cls = cls
+        self.writable = writable
 
     def __get__(self, instance, owner):
-        return self.related_instance(instance._conn, instance._data[self.key])
+        return self.related_instance(instance._conn, self.raw(instance))
 
     def related_instance(self, conn, obj_id):
-        return get_class(self.cls)(conn, obj_id)
+        return conn.get_object(self.cls, obj_id)
+
+    def encode(self, value):
+        # Accept either an object or its id.
+        return getattr(value, '_id', value)
 
 
 class ListField(ObjectField):
@@ -207,10 +1210,13 @@ class ListField(ObjectField):
     """
 
     def __get__(self, instance, owner):
-        ids = instance._data[self.key]
+        ids = self.raw(instance)
         conn = instance._conn
         return [self.related_instance(conn, id) for id in ids]
 
+    def encode(self, value):
+        return [getattr(v, '_id', v) for v in value]
+
 
 class SubList(object):
     """
@@ -223,16 +1229,130 @@ class SubList(object):
         # cls may be a name of a class, or the class itself
         self.cls = cls
 
-        # A dict of sublists, by instance id
-        self._lists = {}
+        # The attribute name, set by TrelloMeta.
+        self.name = None
 
     def __get__(self, instance, owner):
-        if not instance._id in self._lists:
-            cls = get_class(self.cls)
-            path = instance._prefix + instance._id + cls._prefix
-            data = json.loads(instance._conn.get(path))
-            self._lists[instance._id] = [cls(instance._conn, d['id'], d) for d in data]
-        return self._lists[instance._id]
+        if instance is None:
+            return self
+        # Sublists are cached on the instance's connection, keyed by path, so
+        # that they're scoped to that connection and subject to its size and
+        # expiry limits.
+        conn = instance._conn
+        path = self.path(instance)
+        objs = conn.cache.get(path, MISSING)
+        if objs is MISSING:
+            data = conn.recall(path)
+            if data is not MISSING:
+                objs = self.fill(instance, data, persist=False)
+            else:
+                trigger = '%s.%s' % (type(instance).__name__, self.name)
+                with triggered_by(trigger):
+                    objs = self.fill(instance, conn.get_json(path))
+        return objs
+
+    def path(self, instance):
+        return instance._prefix + instance._id + get_class(self.cls)._prefix
+
+    def iterate(self, instance, since=None, before=None, page_size=1000,
+                prefetch=False, fields=None, compact=False, stream=False):
+        """
+        Yield the objects in this sublist of instance one at a time, fetching
+        page_size of them (at most Trello's limit of 1000) per request and
+        paging backwards with Trello's before cursor.  If prefetch is true, the next page is fetched on the
+        connection's thread pool while the current one is consumed.
+
+        The objects aren't cached or added to the identity map, so memory use
+        stays flat however long the list is.
+
+        If fields is given, only those fields of each object are fetched.  If
+        compact is true, each object keeps only the keys it has Fields for,
+        to save memory when many objects are held on to; any others are
+        fetched again if read.
+
+        If stream is true, each page is parsed one object at a time as it
+        arrives, rather than all at once, and prefetch is ignored.
+        """
+        cls = get_class(self.cls)
+        conn = instance._conn
+        path = self.path(instance)
+        # A page shorter than page_size is the last, so don't ask for more
+        # than Trello will send.
+        page_size = min(page_size, MAX_LIMIT)
+
+        def params_for(before):
+            params = projection(fields) if fields else {}
+            params['limit'] = page_size
+            if since is not None:
+                params['since'] = to_cursor(since)
+            if before is not None:
+                params['before'] = to_cursor(before)
+            return params
+
+        def fetch(before):
+            return conn.get_json(path, params_for(before))
+
+        def make(d):
+            obj = cls(conn, d['id'])
+            # Keep the data on the object itself, rather than the cache.
+            obj._data = compact_data(cls, d) if compact else d
+            return obj
+
+        if stream:
+            while True:
+                count = 0
+                for d in conn.iter_json(path, params_for(before)):
+                    count += 1
+                    before = d['id']
+                    obj = make(d)
+                    if conn.decode_sublists:
+                        decode_fields(cls, [obj], [obj._data])
+                    yield obj
+                if count < page_size:
+                    return
+
+        page = fetch(before)
+        while page:
+            last = len(page) < page_size
+            upcoming = None
+            if prefetch and not last:
+                upcoming = conn.executor.submit(fetch, page[-1]['id'])
+
+            objs = [make(d) for d in page]
+            if conn.decode_sublists:
+                decode_fields(cls, objs, [o._data for o in objs])
+            for obj in objs:
+                yield obj
+
+            if last:
+                return
+            if upcoming is not None:
+                page = upcoming.result()
+            else:
+                page = fetch(page[-1]['id'])
+
+    def fill(self, instance, data, persist=True, partial=False):
+        """
+        Cache the parsed JSON list of child documents as this sublist of
+        instance, and persist it too unless persist is false.  If partial is
+        true, the documents only have some fields, and are merged into any
+        data cached for the children already.  Returns the list of objects.
+        """
+        cls = get_class(self.cls)
+        conn = instance._conn
+        if partial:
+            data = [conn.merge(cls._prefix + d['id'], d) for d in data]
+        # The sublist's cache entry holds the children's data.
+        objs = [conn.get_object(cls, d['id']) for d in data]
+        if conn.decode_sublists:
+            decode_fields(cls, objs, data)
+        if persist:
+            conn.remember(self.path(instance), objs, data)
+        else:
+            conn.cache.set(self.path(instance), objs,
+                           children=[(obj._path, d)
+                                     for obj, d in zip(objs, data)])
+        return objs
 
 
 class TrelloMeta(type):
@@ -242,11 +1362,33 @@ class TrelloMeta(type):
     passed to __init__.
     """
     def __new__(cls, name, bases, dct):
+        keys = set(['id'])
+        typed = []
+        for base in bases:
+            keys.update(getattr(base, '_field_keys', ()))
+            typed.extend(getattr(base, '_typed_fields', ()))
         for k, v in dct.items():
             # For every Field on the class that wasn't initted with an explicit
             # 'key', set the field name as the key.
             if isinstance(v, Field) and v.key is None:
                 v.key = k
+            elif isinstance(v, SubList):
+                v.name = k
+            if isinstance(v, Field):
+                keys.add(v.key)
+                if (six.get_unbound_function(type(v).decode) is not
+                        six.get_unbound_function(Field.decode)):
+                    typed.append(v)
+        dct['_field_keys'] = frozenset(keys)
+        # Fields whose values are decoded, and so memoized.
+        dct['_typed_fields'] = tuple(typed)
+
+        # There can be a great many Trello objects alive at once, so the ones
+        # defined here don't get a __dict__.  Subclasses defined elsewhere
+        # still do, unless they declare __slots__ themselves.
+        if dct.get('__module__') == __name__:
+            dct.setdefault('__slots__', ())
+
         return super(TrelloMeta, cls).__new__(cls, name, bases, dct)
 
 
@@ -257,37 +1399,252 @@ class LazyTrello(object):
     should always be subclassed, never used directly.
     """
 
+    # _data is only set on the instance for objects that keep their data out
+    # of the cache (see local_data); otherwise __getattr__ finds it.
+    __slots__ = ('_id', '_conn', '_data', '_changes', '_decoded',
+                 '__weakref__')
+
     # The Trello API path where objects of this type may be found. eg '/cards/'
     @property
     def _prefix(self):
         raise NotImplementedError("LazyTrello subclasses MUST define a _prefix")
 
+    # Related objects that can be loaded along with this one in a single
+    # request, and the query params that ask Trello to nest them in the
+    # response.  See LazyTrello.prefetch.
+    _nested = {}
+
     def __init__(self, conn, obj_id, data=None):
         self._id = obj_id
         self._conn = conn
-        self._path = self._prefix + obj_id
+        self._changes = None
+        self._decoded = None
 
         # If we've been passed the data, then remember it and don't bother
-        # fetching later.
+        # fetching later.  Without a connection there's no cache to put it
+        # in, so keep it on the object.
         if data:
-            self._data = data
+            if conn is None:
+                self._data = data
+            else:
+                conn.cache.set(self._path, data)
 
     def __getattr__(self, attr):
         if attr == '_data':
-            # Something is trying to access the _data attribute.  If we haven't
-            # fetched data from Trello yet, do so now.  Cache the result on the
-            # object.
-            if not '_data' in self.__dict__:
-                self._data = json.loads(self._conn.get(self._path))
-
-            return self._data
+            # Something is trying to access the _data attribute.  Look for it
+            # in the connection's cache, and fetch it from Trello if it's not
+            # there (or has expired).
+            conn = self._conn
+            data = conn.cache.get(self._path, MISSING)
+            if data is MISSING:
+                data = conn.recall(self._path)
+                if data is MISSING:
+                    with triggered_by(data_trigger(self)):
+                        data = self._fetch()
+                else:
+                    conn.cache.set(self._path, data)
+            return data
         else:
             raise AttributeError("%r object has no attribute %r" %
                                  (type(self).__name__, attr))
 
+    @property
+    def _path(self):
+        return self._prefix + self._id
+
     def __getitem__(self, key):
         return self._data[key]
 
+    def _fetch(self):
+        data = self._conn.get_json(self._path)
+        self._conn.remember(self._path, data)
+        return data
+
+    def _change(self, key, raw):
+        """Record an unsaved change to a field."""
+        conn = self._conn
+        with conn._lock:
+            if self._changes is None:
+                self._changes = {}
+            self._changes[key] = raw
+            conn._dirty[self._path] = self
+
+    @property
+    def dirty(self):
+        """Whether this object has changes that haven't been saved."""
+        return bool(self._changes)
+
+    def save(self):
+        """
+        Send all of this object's unsaved changes to Trello in a single PUT,
+        and update the cached data and sublists with the result.  Returns
+        the object.
+        """
+        conn = self._conn
+        with conn._lock:
+            changes, self._changes = self._changes, None
+            conn._dirty.pop(self._path, None)
+        if changes:
+            try:
+                import json
+                data = conn.put_json(self._path, body=json.dumps(changes))
+            except Exception:
+                # Keep the changes, merged under any made since, to retry.
+                with conn._lock:
+                    changes.update(self._changes or {})
+                    self._changes = changes
+                    conn._dirty[self._path] = self
+                raise
+            conn.update_object(self, data)
+        return self
+
+    def _load_field(self, key):
+        """
+        Fetch a single field missing from this object's data, because it was
+        loaded with only some fields, and merge it in.  Returns the data, or
+        raises KeyError if Trello doesn't return the field either.
+        """
+        conn = self._conn
+        if key in conn._missing.get(self._path, ()):
+            raise KeyError(key)
+        data = local_data(self)
+        if data is not None:
+            # Streamed objects keep their own data, out of the cache.
+            data.update(conn.get_json(self._path, projection([key])))
+        else:
+            conn._load_sync(self, [key])
+            data = self._data
+        if key not in data:
+            # Trello doesn't return this field for this object, so don't ask
+            # again until its data is fetched afresh.
+            missing = conn._missing.get(self._path)
+            if missing is None:
+                missing = set()
+                conn._missing.set(self._path, missing)
+            missing.add(key)
+            raise KeyError(key)
+        return data
+
+    def refresh(self):
+        """
+        Bring this object's cached data up to date, downloading it only if
+        it has changed.  Returns whether it had.  See
+        TrelloConnection.refresh.
+        """
+        return bool(self._conn.refresh([self]))
+
+    def load(self, fields=None):
+        """
+        Fetch this object's data from Trello and cache it, replacing any data
+        cached already.  If fields is given, only those fields are fetched.
+        Returns the object (or, on an AsyncTrelloConnection, a coroutine for
+        it).
+        """
+        return self._conn.load(self, fields)
+
+    def fetch(self, name, fields=None):
+        """
+        Fetch the sublist called name, like 'cards', from Trello and cache it,
+        replacing any list cached already.  If fields is given, only those
+        fields of each object are fetched, and any others are fetched when
+        first read.  Returns the list (or, on an AsyncTrelloConnection, a
+        coroutine for it).
+        """
+        return self._conn.fetch_sublist(self, name, fields)
+
+    def iter_sublist(self, name, since=None, before=None, page_size=1000,
+                     prefetch=False, fields=None, compact=False, stream=False):
+        """
+        Yield the objects in the sublist called name one at a time, fetching
+        them a page at a time.  Unlike reading the sublist attribute, this
+        isn't cut off at Trello's 1000 item limit and doesn't hold the whole
+        list in memory.  See SubList.iterate.
+        """
+        return get_sublist(type(self), name).iterate(
+            self, since=since, before=before, page_size=page_size,
+            prefetch=prefetch, fields=fields, compact=compact, stream=stream)
+
+    def prefetch(self, *names, **options):
+        """
+        Fetch this object together with the named related objects in one
+        request, using Trello's nested resources, and cache all of them.
+        Names are sublists or related fields, like 'cards' or 'members'.
+        Dotted names like 'cards.members' reach one level further.  Pass
+        fields=[...] to fetch only some of this object's own fields.
+        """
+        fields = options.get('fields')
+        params = projection(fields) if fields else {}
+        for name in names:
+            try:
+                params.update(self._nested[name])
+            except KeyError:
+                raise ValueError("%s objects can't prefetch %r" %
+                                 (type(self).__name__, name))
+        data = self._conn.get_json(self._path, params)
+        self._store_nested(data, names)
+        if fields:
+            self._conn.merge(self._path, data)
+        else:
+            self._conn.remember(self._path, data)
+        return self
+
+    def _store_nested(self, data, names):
+        """
+        Move nested resources out of data (a prefetch response for this
+        object) into the cache, as the data of related objects and as
+        sublists.
+        """
+        conn = self._conn
+        sublists = {}
+        names = implied_names(type(self), names)
+
+        for name in names:
+            if '.' in name or name not in data:
+                continue
+            field = get_descriptor(type(self), name)
+            if isinstance(field, SubList):
+                cls = get_class(field.cls)
+            elif isinstance(field, ObjectField):
+                cls = get_class(field.cls)
+            else:
+                continue
+
+            nested = data.pop(name)
+            inner = [n.split('.', 1)[1] for n in names
+                     if n.startswith(name + '.')]
+            docs = nested if isinstance(nested, list) else [nested]
+            objs = []
+            for d in docs:
+                # A sublist's cache entry holds the data of the objects in it.
+                obj = conn.get_object(cls, d['id'],
+                                      None if isinstance(field, SubList)
+                                      else d)
+                obj._store_nested(d, inner)
+                objs.append(obj)
+
+            if isinstance(field, SubList):
+                conn.remember(self._path + cls._prefix, objs, docs)
+                sublists[name] = (cls, objs)
+
+        # Something like 'lists.cards' on a board, where Trello doesn't nest
+        # the cards under each list.  Sort the board's cards into their lists
+        # by idList instead.
+        for name in names:
+            parent, _, child = name.partition('.')
+            if parent not in sublists or child not in sublists:
+                continue
+            child_cls, children = sublists[child]
+            for obj in sublists[parent][1]:
+                field = get_descriptor(type(obj), child)
+                if not isinstance(field, SubList):
+                    continue
+                path = obj._path + child_cls._prefix
+                if path in conn.cache:
+                    continue
+                key = 'id' + type(obj).__name__
+                objs = [c for c in children if c._data.get(key) == obj._id]
+                conn.remember(path, objs, [c._data for c in objs])
+
     def __unicode__(self):
         tmpl = u'<%(cls)s: %(name_or_id)s>'
         # If I have a name, use that
@@ -320,16 +1677,30 @@ class Action(LazyTrello):
     creator = ObjectField('idMemberCreator', 'Member')
 
 
-class Board(LazyTrello, Closable):
+class Board(LazyTrello, Closable, Actionable):
 
     _prefix = '/boards/'
+    _nested = {
+        'actions': {'actions': 'all', 'actions_limit': 1000},
+        'cards': {'cards': 'visible'},
+        'cards.attachments': {'cards': 'visible', 'card_attachments': 'true'},
+        'cards.members': {'cards': 'visible', 'card_members': 'true'},
+        'cards.stickers': {'cards': 'visible', 'card_stickers': 'true'},
+        'checklists': {'checklists': 'all'},
+        'checklists.checkItems': {'checklists': 'all'},
+        'labels': {'labels': 'all'},
+        'lists': {'lists': 'open'},
+        'lists.cards': {'lists': 'open', 'cards': 'visible'},
+        'members': {'members': 'all'},
+        'organization': {'organization': 'true'},
+    }
 
     url = Field()
-    name = Field()
+    name = Field(writable=True)
     pinned = Field()
     prefs = Field()
-    desc = Field()
-    closed = Field()
+    desc = Field(writable=True)
+    closed = Field(writable=True)
 
     organization = ObjectField('idOrganization', 'Organization')
 
@@ -340,28 +1711,72 @@ class Board(LazyTrello, Closable):
     members = SubList('Member')
     labels = SubList('Label')
 
+    def download_attachments(self, directory, window=None):
+        """
+        Download the uploaded attachments of all this board's cards into
+        directory, concurrently and a chunk at a time, each to
+        <directory>/<card id>/<attachment id>/<name>.  The cards and their
+        attachments are fetched in one request.  See TrelloConnection.bulk
+        for window.
+
+        Returns a list of BulkResults, whose op is the Attachment and whose
+        result is the path it was saved to, or whose error is why it wasn't.
+        """
+        self.prefetch('cards', 'cards.attachments')
+        attachments = []
+        ops = []
+        for card in self.cards:
+            for attachment in card.attachments:
+                if not attachment._data.get('isUpload'):
+                    continue  # a link, not a file
+                folder = os.path.join(directory, card._id, attachment._id)
+                if not os.path.isdir(folder):
+                    os.makedirs(folder)
+                attachments.append(attachment)
+                ops.append(functools.partial(attachment.download, folder))
+        results = self._conn.bulk(ops, window)
+        return [BulkResult(attachment, result, error)
+                for attachment, (op, result, error) in zip(attachments, results)]
+
+    def query(self, **criteria):
+        """
+        Return this board's cards matching criteria, like label='red' or
+        member=conn.me or due_before=friday, from indexes kept in memory and
+        up to date with the cached cards, without requests or full scans.
+        See trollop.query.BoardIndex.query for the criteria.
+        """
+        return self._conn.board_index(self).query(**criteria)
+
 
 class Card(LazyTrello, Closable, Deletable, Labeled):
 
     _prefix = '/cards/'
+    _nested = {
+        'attachments': {'attachments': 'true'},
+        'board': {'board': 'true'},
+        'checklists': {'checklists': 'all'},
+        'list': {'list': 'true'},
+        'members': {'members': 'true'},
+        'stickers': {'stickers': 'true'},
+    }
 
     url = Field()
-    closed = Field()
-    name = Field()
+    closed = Field(writable=True)
+    name = Field(writable=True)
     badges = Field()
     checkItemStates = Field()
-    desc = Field()
-    idLabels = Field()
-    due = DateField()
+    desc = Field(writable=True)
+    idLabels = Field(writable=True)
+    due = DateField(writable=True)
 
-    board = ObjectField('idBoard', 'Board')
-    list = ObjectField('idList', 'List')
+    board = ObjectField('idBoard', 'Board', writable=True)
+    list = ObjectField('idList', 'List', writable=True)
     stickers = SubList('Sticker')
     attachments = SubList('Attachment')
     labels = SubList('Label')
 
     checklists = ListField('idChecklists', 'Checklist')
-    members = ListField('idMembers', 'Member')
+    members = ListField('idMembers', 'Member', writable=True)
 
     def detach(self, attachment):
         """
@@ -373,7 +1788,8 @@ class Card(LazyTrello, Closable, Deletable, Labeled):
 
     def attach(self, name, file):
         """
-        Create new attachment from the open 'file' and name it 'name'.
+        Create new attachment from the open 'file' (or bytes, or text) and
+        name it 'name'.
         """
         path = self._path + '/attachments'
         return self._conn.request('POST', path, body=file, filename=name)
@@ -390,6 +1806,8 @@ class Card(LazyTrello, Closable, Deletable, Labeled):
             self._conn.put(path, dict(value=due_date))
         else:
             self._conn.put(path, dict(value=''))
+        self._conn.update_object(self, {'due': due_date or None},
+                                 partial=True)
 
     def set_cover(self, attachment):
         """
@@ -401,6 +1819,9 @@ class Card(LazyTrello, Closable, Deletable, Labeled):
             self._conn.put(path, dict(value=attachment._id))
         else:
             self._conn.put(path, dict(value=''))
+        self._conn.update_object(
+            self, {'idAttachmentCover': attachment._id if attachment else None},
+            partial=True)
 
     def paste_sticker(self, name, position, rotate=None):
         """
@@ -440,7 +1861,7 @@ class Checklist(LazyTrello):
     _prefix = '/checklists/'
 
     checkItems = SubList('CheckItem')
-    name = Field()
+    name = Field(writable=True)
     board = ObjectField('idBoard', 'Board')
     cards = SubList('Card')
 
@@ -461,30 +1882,67 @@ class CheckItem(LazyTrello):
 class List(LazyTrello, Closable):
 
     _prefix = '/lists/'
+    _nested = {
+        'board': {'board': 'true'},
+        'cards': {'cards': 'open'},
+    }
 
-    closed = Field()
-    name = Field()
+    closed = Field(writable=True)
+    name = Field(writable=True)
     url = Field()
     board = ObjectField('idBoard', 'Board')
     cards = SubList('Card')
 
-    # TODO: Generalize this pattern, add it to a base class, and make it work
-    # correctly with SubList
+    # TODO: Generalize this pattern, and add it to a base class.
     def add_card(self, name, desc=None):
+        params = {'name': name}
+        if desc is not None:
+            params['desc'] = desc[:1000]
+        return self._create_card(params)
+
+    def add_cards(self, cards, window=None):
+        """
+        Create many cards on this list concurrently.  Each item in cards is
+        either a name or a dict of card fields, like {'name': ..., 'desc':
+        ..., 'due': ...}.  See TrelloConnection.bulk for window.
+
+        Returns a list of BulkResults, in the same order as cards, whose
+        result is the new Card or whose error is why it wasn't created.  New
+        cards are added to this list's cached cards.
+        """
+        ops = (functools.partial(self._create_card, card, False)
+               for card in cards)
+        results = [BulkResult(op.args[0], result, error)
+                   for op, result, error in self._conn.bulk(ops, window)]
+        # Added to the cached sublists once they're all created, in one go,
+        # rather than by each thread as it finishes.
+        self._conn.add_created(r.result for r in results if r.error is None)
+        return results
+
+    def _create_card(self, card, place=True):
+        if isinstance(card, six.string_types):
+            params = {'name': card}
+        else:
+            params = dict(card)
+        params['idList'] = self._id
         path = self._prefix + self._id + '/cards'
-        params = {'name': name, 'idList': self._id, 'desc': desc[:1000],
-                  'key': self._conn.key, 'token': self._conn.token}
-        data = json.loads(self._conn.post(path, params=params))
-        card = Card(self._conn, data['id'], data)
+        data = self._conn.post_json(path, params=params)
+        card = self._conn.get_object(Card, data['id'])
+        if place:
+            # Caches the data, and adds the card to its list's and board's
+            # cached cards.
+            self._conn.update_object(card, data)
+        else:
+            self._conn.merge(card._path, data)
         return card
 
 class Label(LazyTrello):
-    _prefix = "/labels"
+    _prefix = '/labels/'
 
     board = ObjectField('idBoard', 'Board')
 
-    name = Field()
-    color = Field()
+    name = Field(writable=True)
+    color = Field(writable=True)
     uses = IntField()
 
 class Sticker(LazyTrello):
@@ -504,9 +1962,39 @@ class Attachment(LazyTrello):
     url = Field()
     isUpload = BoolField()
 
+    def iter_content(self, chunk_size=65536):
+        """
+        Yield this attachment's content in chunks of at most chunk_size
+        bytes.
+        """
+        return self._conn.iter_content(self.url, chunk_size)
 
-
-class Member(LazyTrello):
+    def download(self, to, chunk_size=65536):
+        """
+        Download this attachment a chunk at a time to to, which is an open
+        binary file, a file path, or a directory to save it in under its own
+        name.  Returns to, or the path of the file saved in it.
+        """
+        if not isinstance(to, six.string_types):
+            for chunk in self.iter_content(chunk_size):
+                to.write(chunk)
+            return to
+        if os.path.isdir(to):
+            to = os.path.join(to, os.path.basename(self.name) or self._id)
+        try:
+            with open(to, 'wb') as f:
+                for chunk in self.iter_content(chunk_size):
+                    f.write(chunk)
+        except Exception:
+            # Don't leave half a file behind.
+            if os.path.exists(to):
+                os.remove(to)
+            raise
+        return to
+
+
+
+class Member(LazyTrello, Actionable):
 
     _prefix = '/members/'
 
@@ -533,7 +2021,7 @@ class Notification(LazyTrello):
     creator = ObjectField('idMemberCreator', 'Member')
 
 
-class Organization(LazyTrello):
+class Organization(LazyTrello, Actionable):
 
     _prefix = '/organizations/'
 
@@ -545,3 +2033,13 @@ class Organization(LazyTrello):
     actions = SubList('Action')
     boards = SubList('Board')
     members = SubList('Member')
+
+
+class Webhook(LazyTrello, Deletable):
+
+    _prefix = '/webhooks/'
+
+    description = Field(writable=True)
+    callback_url = Field('callbackURL', writable=True)
+    model_id = Field('idModel', writable=True)
+    active = BoolField(writable=True)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+JSON decoding for TrelloConnection: a default loads function, which uses
+orjson when it's installed, and a decoder for JSON lists that yields their
+items one at a time as the bytes arrive.
+"""
+
+import codecs
+import re
+import sys
+
+
+def stdlib_loads(data):
+    """Parse JSON from bytes or text with the standard library."""
+    if isinstance(data, bytes) and sys.version_info[:2] == (3, 5):
+        # json.loads only takes bytes from Python 3.6 on.
+        data = data.decode('utf-8')
+    import json
+    return json.loads(data)
+
+
+_backend = []
+
+
+def loads(data):
+    """
+    Parse JSON straight from the response bytes, without first decoding them
+    to text: with orjson if it's installed, or else the json module.  orjson
+    is only imported by the first call, as it's slow to import.
+    """
+    if not _backend:
+        try:
+            import orjson
+            _backend.append(orjson.loads)
+        except ImportError:
+            _backend.append(stdlib_loads)
+    return _backend[0](data)
+
+
+# Whitespace, and the commas between list items.
+SEPARATORS = re.compile(r'[\s,]*')
+WHITESPACE = re.compile(r'\s*')
+
+
+def iter_items(chunks):
+    """
+    Yield the items of a JSON list, read from an iterable of byte chunks,
+    each as soon as it's complete.  Only one item, and one chunk, is held in
+    memory at a time.  Raises ValueError if the JSON isn't a list, or ends
+    early.
+    """
+    import json
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    buf = u''
+    pos = 0
+    started = False
+    for chunk in chunks:
+        buf = buf[pos:] + text.decode(chunk)
+        pos = 0
+        while True:
+            pos = SEPARATORS.match(buf, pos).end()
+            if pos == len(buf):
+                break
+            if not started:
+                if buf[pos] != '[':
+                    raise ValueError('expected a JSON list')
+                started = True
+                pos += 1
+                continue
+            if buf[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                break  # the rest of the item is yet to come
+            follows = WHITESPACE.match(buf, end).end()
+            if follows == len(buf) or buf[follows] not in ',]':
+                # It may be cut short, like 1 of 1.5 or 1e3; wait for the
+                # comma or ] that follows every item.
+                break
+            yield item
+            pos = end
+    raise ValueError('JSON list ended early')
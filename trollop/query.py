@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Query a board's cards locally, from in-memory indexes over the cards cached
+on its connection, rather than walking them and lazily loading whatever they
+refer to.
+"""
+
+import bisect
+import datetime
+import threading
+from collections import defaultdict
+
+from .cache import MISSING
+from .lib import Card
+
+
+CARD_PREFIX = Card._prefix
+
+
+class BoardIndex(object):
+    """
+    Indexes of a board's cards by list, label, member, due date and closed
+    state.  It's built from the board's cards (fetching them if they aren't
+    cached), then kept up to date from the connection's cache: whenever card
+    data is cached, by a fetch, a save, a prefetch or a BoardSync, the card
+    is re-indexed.  Cards whose data is invalidated are fetched again, in
+    batches, by the next query.
+
+    Use Board.query rather than making one of these directly, so that there's
+    only one index per board on a connection.
+    """
+
+    def __init__(self, board):
+        self.board = board
+        self.conn = board._conn
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._stale = set()
+        self._by_list = defaultdict(set)
+        self._by_label = defaultdict(set)
+        self._by_member = defaultdict(set)
+        self._closed = set()
+        self._due = []  # sorted (due, card id) pairs
+
+        self.conn.cache.listeners.append(self._changed)
+        for card in board.cards:
+            self.add(card._id, card._data)
+
+    def close(self):
+        """Stop updating this index."""
+        self.conn.cache.listeners.remove(self._changed)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _changed(self, key, value):
+        if key is None:
+            # The whole cache was cleared.
+            with self._lock:
+                self._stale.update(self._entries)
+            return
+        if not key.startswith(CARD_PREFIX) or '/' in key[len(CARD_PREFIX):]:
+            return
+        card_id = key[len(CARD_PREFIX):]
+        with self._lock:
+            if value is MISSING:
+                if card_id in self._entries:
+                    self._stale.add(card_id)
+            elif value.get('idBoard', self.board._id) != self.board._id:
+                self.remove(card_id)
+            elif 'idBoard' in value or card_id in self._entries:
+                self.add(card_id, value)
+
+    def add(self, card_id, data):
+        """Index (or re-index) a card of this board from its data."""
+        with self._lock:
+            old = self._entries.get(card_id)
+            if old is not None:
+                self.remove(card_id)
+                # Data fetched with only some fields keeps what was known.
+                merged = dict(old)
+                merged.update(data)
+                data = merged
+            entry = {
+                'idList': data.get('idList'),
+                'idLabels': list(data.get('idLabels') or []),
+                'labels': list(data.get('labels') or []),
+                'idMembers': list(data.get('idMembers') or []),
+                'due': data.get('due'),
+                'closed': bool(data.get('closed')),
+                'pos': data.get('pos', 0),
+            }
+            self._entries[card_id] = entry
+            self._stale.discard(card_id)
+
+            self._by_list[entry['idList']].add(card_id)
+            for key in label_keys(entry):
+                self._by_label[key].add(card_id)
+            for member_id in entry['idMembers']:
+                self._by_member[member_id].add(card_id)
+            if entry['closed']:
+                self._closed.add(card_id)
+            if entry['due']:
+                bisect.insort(self._due, (entry['due'], card_id))
+
+    def remove(self, card_id):
+        """Take a card out of the index."""
+        with self._lock:
+            entry = self._entries.pop(card_id, None)
+            self._stale.discard(card_id)
+            if entry is None:
+                return
+            discard(self._by_list, entry['idList'], card_id)
+            for key in label_keys(entry):
+                discard(self._by_label, key, card_id)
+            for member_id in entry['idMembers']:
+                discard(self._by_member, member_id, card_id)
+            self._closed.discard(card_id)
+            if entry['due']:
+                i = bisect.bisect_left(self._due, (entry['due'], card_id))
+                if i < len(self._due) and self._due[i] == (entry['due'],
+                                                           card_id):
+                    del self._due[i]
+
+    def refresh(self):
+        """
+        Fetch the cards whose cached data has been invalidated, and drop
+        those that can't be fetched.
+        """
+        with self._lock:
+            stale = list(self._stale)
+        if not stale:
+            return
+        cards = [self.conn.get_object(Card, card_id) for card_id in stale]
+        self.conn.fetch_many(cards)
+        with self._lock:
+            for card in cards:
+                if card._id in self._stale:
+                    self.remove(card._id)
+
+    def query(self, list=None, label=None, member=None, due_before=None,
+              due_after=None, closed=False):
+        """
+        Return the cards matching all the criteria given, ordered by
+        position:
+
+        list: a List or list id.
+        label: a Label, or a label's id, color or name.
+        member: a Member or member id.
+        due_after, due_before: dates, datetimes or Trello date strings.  Cards
+            due at or after due_after, and before due_before.
+        closed: False (the default) for open cards, True for closed ones, or
+            None for both.
+        """
+        self.refresh()
+        with self._lock:
+            matches = []
+            if list is not None:
+                matches.append(self._by_list.get(object_id(list), ()))
+            if label is not None:
+                matches.append(self._by_label.get(object_id(label), ()))
+            if member is not None:
+                matches.append(self._by_member.get(self.member_id(member),
+                                                   ()))
+            if due_before is not None or due_after is not None:
+                lo = 0
+                hi = len(self._due)
+                if due_after is not None:
+                    lo = bisect.bisect_left(self._due, (trello_date(due_after),))
+                if due_before is not None:
+                    hi = bisect.bisect_left(self._due,
+                                            (trello_date(due_before),))
+                matches.append(set(card_id for _, card_id in
+                                   self._due[lo:hi]))
+
+            if matches:
+                matches.sort(key=len)
+                ids = set(matches[0])
+                for other in matches[1:]:
+                    ids.intersection_update(other)
+            else:
+                ids = set(self._entries)
+            if closed is not None:
+                ids = [i for i in ids if (i in self._closed) == bool(closed)]
+            ids = sorted(ids, key=lambda i: (self._entries[i]['pos'], i))
+        return [self.conn.get_object(Card, card_id) for card_id in ids]
+
+    def member_id(self, member):
+        member_id = object_id(member)
+        if member_id == 'me':
+            # conn.me is known by its real id on cards.
+            member_id = member['id']
+        return member_id
+
+
+def label_keys(entry):
+    """A card's labels can be looked up by id, color or name."""
+    keys = set(entry['idLabels'])
+    for label in entry['labels']:
+        keys.update(label.get(k) for k in ('id', 'color', 'name'))
+    keys.discard(None)
+    keys.discard('')
+    return keys
+
+
+def discard(index, key, card_id):
+    ids = index.get(key)
+    if ids is not None:
+        ids.discard(card_id)
+        if not ids:
+            del index[key]
+
+
+def object_id(obj):
+    return getattr(obj, '_id', obj)
+
+
+def trello_date(value):
+    """Format a date or datetime like Trello does, in UTC."""
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.replace(tzinfo=None) - value.utcoffset()
+        return value.strftime('%Y-%m-%dT%H:%M:%S.') + \
+            '%03dZ' % (value.microsecond // 1000)
+    if isinstance(value, datetime.date):
+        return value.strftime('%Y-%m-%dT00:00:00.000Z')
+    return value
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+
+import random
+import threading
+import time
+
+
+# Methods that can safely be sent again after a server error.  Any method can
+# be retried after a 429, since Trello didn't act on the request.
+IDEMPOTENT_METHODS = frozenset(['GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'])
+
+# Headers in which Trello reports how many requests are left in the current
+# window, for the API key and for the user's token.
+REMAINING_HEADERS = ('x-rate-limit-api-key-remaining',
+                     'x-rate-limit-api-token-remaining')
+
+
+class RateLimiter(object):
+    """
+    Schedules the requests sent by a TrelloConnection so they stay under
+    Trello's rate limits, and decides when failed requests should be retried.
+
+    Requests draw from a token bucket that holds up to burst tokens and
+    refills at rate tokens per second.  The defaults match Trello's limit of
+    100 requests per 10 seconds per token.  The bucket is also drained to
+    match the remaining counts Trello reports in response headers, and
+    Retry-After holds back every request until it has passed.
+
+    Throttled (429) and server error (5xx) responses are retried up to
+    max_retries times, after a jittered exponential backoff that starts at
+    backoff seconds and is capped at max_backoff.  Server errors are only
+    retried for idempotent methods.
+    """
+
+    def __init__(self, rate=10.0, burst=100, max_retries=5, backoff=0.5,
+                 max_backoff=30.0):
+        self.rate = float(rate)
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.time()
+        self._blocked_until = 0.0
+
+        # Metrics.  waiting is the number of requests currently queued for a
+        # token, throttled is the total seconds spent waiting.
+        self.waiting = 0
+        self.throttled = 0.0
+        self.retries = 0
+
+    def _refill(self, now):
+        elapsed = max(now - self._updated, 0)
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def _sleep(self, seconds):
+        if seconds > 0:
+            time.sleep(seconds)
+            with self._lock:
+                self.throttled += seconds
+
+    def acquire(self):
+        """
+        Block until a request may be sent, and take a token for it.
+        """
+        with self._lock:
+            self.waiting += 1
+        try:
+            while True:
+                with self._lock:
+                    now = time.time()
+                    self._refill(now)
+                    delay = self._blocked_until - now
+                    if delay <= 0:
+                        if self._tokens >= 1:
+                            self._tokens -= 1
+                            return
+                        delay = (1 - self._tokens) / self.rate
+                self._sleep(delay)
+        finally:
+            with self._lock:
+                self.waiting -= 1
+
+    def update(self, response):
+        """
+        Adjust the schedule to the rate limit headers on a response.
+        """
+        headers = response.headers
+        with self._lock:
+            for name in REMAINING_HEADERS:
+                remaining = headers.get(name)
+                if remaining is not None:
+                    self._tokens = min(self._tokens, float(remaining))
+
+            retry_after = retry_after_seconds(headers)
+            if retry_after:
+                self._blocked_until = max(self._blocked_until,
+                                          time.time() + retry_after)
+
+    def should_retry(self, method, response, attempt):
+        if attempt >= self.max_retries:
+            return False
+        status = response.status_code
+        if status == 429:
+            return True
+        return status >= 500 and method.upper() in IDEMPOTENT_METHODS
+
+    def retry(self, response, attempt):
+        """
+        Wait before sending attempt number attempt + 1 of a failed request.
+        """
+        cap = min(self.max_backoff, self.backoff * 2 ** attempt)
+        delay = max(random.uniform(0, cap),
+                    retry_after_seconds(response.headers) or 0)
+        with self._lock:
+            self.retries += 1
+        self._sleep(delay)
+
+    def stats(self):
+        return {'waiting': self.waiting,
+                'throttled': self.throttled,
+                'retries': self.retries}
+
+
+def retry_after_seconds(headers):
+    """
+    Return the number of seconds in a Retry-After header, or None.  Only the
+    delay-seconds form is understood, which is the one Trello sends.
+    """
+    value = headers.get('Retry-After', headers.get('retry-after'))
+    try:
+        return max(float(value), 0)
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Request metrics for TrelloConnection: per-endpoint latency histograms, bytes
+sent and received, JSON decode time, which Field or SubList triggered each
+lazy fetch, and a detector for N+1 access patterns.
+"""
+
+import os
+import re
+import sys
+import threading
+import warnings
+from collections import defaultdict
+
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+                   float('inf'))
+
+# Trello ids are 24 hex digits.  They're replaced in paths so that requests
+# for different objects of the same kind count towards the same endpoint.
+ID_RE = re.compile(r'(?<=/)[0-9a-fA-F]{24}(?=/|$)')
+
+# Paths under /tokens/ name the API token itself, which mustn't end up in
+# metrics, hooks or traces.
+TOKEN_RE = re.compile(r'(?<=/tokens/)[^/]+')
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+_local = threading.local()
+
+
+def redact(path):
+    """Return path with any API token in it replaced by ':token'."""
+    return TOKEN_RE.sub(':token', path)
+
+
+def endpoint(path):
+    """Return path with Trello ids replaced by ':id', and tokens redacted."""
+    return ID_RE.sub(':id', redact(path))
+
+
+class NPlusOneWarning(UserWarning):
+    """
+    Warns that one line of code has lazily fetched many similar objects one
+    at a time, which prefetch, fetch_many or map_load could do in bulk.
+    """
+
+
+class RequestEvent(object):
+    """
+    What's known about one request made by a TrelloConnection, passed to the
+    connection's hooks once it has finished.  trigger names the Field or
+    SubList (like 'Card.name') whose lazy access caused the request, and
+    location the line of calling code, if there was one.  Any API token in
+    path is redacted.
+    """
+
+    def __init__(self, method, path, status, start, end, bytes_sent,
+                 bytes_received, attempts=1, trigger=None, location=None):
+        self.method = method
+        self.path = redact(path)
+        self.endpoint = endpoint(path)
+        self.status = status
+        self.start = start
+        self.end = end
+        self.bytes_sent = bytes_sent
+        self.bytes_received = bytes_received
+        self.attempts = attempts
+        self.trigger = trigger
+        self.location = location
+
+    @property
+    def elapsed(self):
+        return self.end - self.start
+
+    def __repr__(self):
+        return '<RequestEvent: %s %s %s %.3fs>' % (
+            self.method, self.endpoint, self.status, self.elapsed)
+
+
+class EndpointStats(object):
+    """Totals for the requests made to one endpoint."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.lazy_loads = 0
+        self.shared = 0
+        self.total_time = 0.0
+        self.decode_time = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+
+    def add(self, event):
+        self.requests += 1
+        if event.status is None or event.status >= 400:
+            self.errors += 1
+        if event.trigger is not None:
+            self.lazy_loads += 1
+        self.total_time += event.elapsed
+        self.bytes_sent += event.bytes_sent
+        self.bytes_received += event.bytes_received
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if event.elapsed <= bound:
+                self.histogram[i] += 1
+                break
+
+    def as_dict(self):
+        return {'requests': self.requests,
+                'errors': self.errors,
+                'lazy_loads': self.lazy_loads,
+                'shared': self.shared,
+                'total_time': self.total_time,
+                'decode_time': self.decode_time,
+                'bytes_sent': self.bytes_sent,
+                'bytes_received': self.bytes_received,
+                'histogram': list(zip(LATENCY_BUCKETS, self.histogram))}
+
+
+class Stats(object):
+    """
+    Collects RequestEvents into per-endpoint totals, and watches lazy
+    fetches for N+1 patterns.  Once n_plus_one_threshold lazy fetches of the
+    same endpoint, triggered by the same Field or SubList from the same line
+    of code, have been seen, an NPlusOneWarning is issued (once per line).
+    Set the threshold to None to turn the detector off.
+    """
+
+    def __init__(self, n_plus_one_threshold=20):
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.endpoints = defaultdict(EndpointStats)
+        self._lazy = defaultdict(int)
+        self._warned = set()
+        self._lock = threading.Lock()
+
+    def record(self, event):
+        with self._lock:
+            self.endpoints[event.endpoint].add(event)
+            if event.trigger is None or self.n_plus_one_threshold is None:
+                return
+            key = (event.trigger, event.endpoint, event.location)
+            self._lazy[key] += 1
+            if (self._lazy[key] < self.n_plus_one_threshold or
+                    key in self._warned):
+                return
+            self._warned.add(key)
+        warnings.warn(
+            '%s at %s has lazily fetched %s %d times; consider prefetch, '
+            'fetch_many or map_load' % (event.trigger, event.location,
+                                        event.endpoint, self._lazy[key]),
+            NPlusOneWarning, stacklevel=2)
+
+    def record_shared(self, path):
+        """Count a GET that shared another's identical request in flight."""
+        with self._lock:
+            self.endpoints[endpoint(path)].shared += 1
+
+    def record_decode(self, path, seconds):
+        with self._lock:
+            self.endpoints[endpoint(path)].decode_time += seconds
+
+    def snapshot(self):
+        with self._lock:
+            return dict((name, stats.as_dict())
+                        for name, stats in self.endpoints.items())
+
+    def reset(self):
+        with self._lock:
+            self.endpoints.clear()
+            self._lazy.clear()
+            self._warned.clear()
+
+
+class triggered_by(object):
+    """
+    Context manager marking requests made inside it as lazy fetches caused
+    by trigger, a name like 'Board.cards'.
+    """
+
+    def __init__(self, trigger):
+        self.trigger = trigger
+
+    def __enter__(self):
+        self.outer = getattr(_local, 'trigger', None)
+        _local.trigger = (self.trigger, caller_location())
+
+    def __exit__(self, *exc_info):
+        _local.trigger = self.outer
+
+
+def current_trigger():
+    """Return the (trigger, location) of the lazy fetch in progress on this
+    thread, or (None, None)."""
+    return getattr(_local, 'trigger', None) or (None, None)
+
+
+def caller_location():
+    """Return 'file:line' for the innermost frame outside this package."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if os.path.dirname(os.path.abspath(filename)) != PACKAGE_DIR:
+            return '%s:%d' % (filename, frame.f_lineno)
+        frame = frame.f_back
+    return None
+
+
+class TracingHook(object):
+    """
+    A TrelloConnection hook that records each request as a span, using an
+    OpenTelemetry-style tracer (anything with start_span(name, start_time=)
+    returning spans with set_attribute and end(end_time=)).
+
+        conn.add_hook(TracingHook(trace.get_tracer('trollop')))
+    """
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    def __call__(self, event):
+        span = self.tracer.start_span(
+            'trello %s %s' % (event.method, event.endpoint),
+            start_time=int(event.start * 1e9))
+        span.set_attribute('http.method', event.method)
+        span.set_attribute('http.route', event.endpoint)
+        if event.status is not None:
+            span.set_attribute('http.status_code', event.status)
+        span.set_attribute('trollop.attempts', event.attempts)
+        if event.trigger is not None:
+            span.set_attribute('trollop.trigger', event.trigger)
+        span.end(end_time=int(event.end * 1e9))
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+import json
+import sqlite3
+import threading
+import time
+
+
+class SQLiteStore(object):
+    """
+    A persistent store for the JSON that a TrelloConnection fetches, so that
+    new processes can start from what earlier ones downloaded.  Objects are
+    stored by path (like /cards/<id>), and sublists as the list of child
+    documents under the sublist's path (like /boards/<id>/cards/), each with
+    the time it was fetched.
+
+    Entries older than max_age seconds are stale: get() ignores them, so
+    they're fetched from Trello again, and overwritten.  None means entries
+    never go stale.
+
+    Any object with the same get/set/delete/delete_prefix methods can be used
+    as a TrelloConnection's store instead.
+    """
+
+    def __init__(self, path, max_age=None):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            if path != ':memory:':
+                # Let several worker processes read while one writes.
+                self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('CREATE TABLE IF NOT EXISTS entries '
+                             '(key TEXT PRIMARY KEY, value TEXT, '
+                             'fetched REAL)')
+            self._db.commit()
+
+    def get(self, key, default=None):
+        entry = self.get_entry(key)
+        if entry is None:
+            return default
+        value, fetched = entry
+        if self.max_age is not None and fetched + self.max_age <= time.time():
+            return default
+        return value
+
+    def get_entry(self, key):
+        """
+        Return a (value, fetched timestamp) tuple for key, stale or not, or
+        None if there isn't one.
+        """
+        with self._lock:
+            row = self._db.execute(
+                'SELECT value, fetched FROM entries WHERE key = ?',
+                (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, fetched=None):
+        if fetched is None:
+            fetched = time.time()
+        with self._lock:
+            self._db.execute(
+                'INSERT OR REPLACE INTO entries (key, value, fetched) '
+                'VALUES (?, ?, ?)', (key, json.dumps(value), fetched))
+            self._db.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self._db.commit()
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            self._db.execute(
+                'DELETE FROM entries WHERE substr(key, 1, ?) = ?',
+                (len(prefix), prefix))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Keep a board's cached lists and cards up to date from its actions, instead of
+fetching them again in full.
+"""
+
+from collections import OrderedDict
+
+from .lib import cached_position, get_sublist, Card, List
+
+
+# Actions that change a card on the board.  Those with an 'old' dict in their
+# data are applied in place; the rest mean the card is fetched again.
+CARD_ACTIONS = frozenset([
+    'createCard', 'copyCard', 'convertToCardFromCheckItem', 'moveCardToBoard',
+    'updateCard', 'addMemberToCard', 'removeMemberFromCard',
+    'addLabelToCard', 'removeLabelFromCard', 'addChecklistToCard',
+    'removeChecklistFromCard', 'addAttachmentToCard',
+    'deleteAttachmentFromCard',
+])
+CARD_REMOVALS = frozenset(['deleteCard', 'moveCardFromBoard'])
+
+LIST_ACTIONS = frozenset(['createList', 'updateList', 'moveListToBoard'])
+LIST_REMOVALS = frozenset(['moveListFromBoard'])
+
+
+class BoardSync(object):
+    """
+    Mirrors a Board's lists and cards in its connection's cache, and keeps
+    them current by polling the board's actions.
+
+        sync = BoardSync(conn.get_board(board_id))
+        sync.start()    # loads the lists and cards in one request
+        ...
+        sync.poll()     # applies whatever happened since
+
+    Each poll costs one request for the new actions, plus one batched
+    request per 10 cards or lists that need fetching again because an update
+    couldn't be applied in place.  Pass since (an action id) to resume from a
+    previous sync's last_action.
+    """
+
+    def __init__(self, board, since=None):
+        self.board = board
+        self.conn = board._conn
+        self.last_action = since
+
+    def start(self):
+        """
+        Load the board's lists and cards in full, remembering the newest
+        action so later polls only see what changed after it.
+        """
+        if self.last_action is None:
+            newest = next(self.board.iter_actions(page_size=1), None)
+            if newest is not None:
+                self.last_action = newest._id
+        self.board.prefetch('lists', 'cards', 'lists.cards')
+        return self
+
+    def poll(self):
+        """
+        Fetch the board's actions since the last poll and apply them to the
+        cached lists and cards.  Returns the actions applied, oldest first.
+        """
+        actions = [a._data for a in
+                   self.board.iter_actions(since=self.last_action)]
+        actions.reverse()
+        return self.apply_actions(actions)
+
+    def apply_actions(self, actions, fetch=True):
+        """
+        Apply the board's actions (their JSON, oldest first) to the cached
+        lists and cards, as poll does.  Cards and lists whose changes can't
+        be applied in place are fetched again, in batches; or, if fetch is
+        false, evicted from the cache along with the sublists they belong
+        in, so that nothing is fetched until they're next read.  Returns
+        actions.
+        """
+        if not actions:
+            return actions
+
+        cards = OrderedDict()
+        lists = OrderedDict()
+        stale = []
+        for action in actions:
+            kind = action['type']
+            data = action.get('data', {})
+            if kind in CARD_ACTIONS and 'card' in data:
+                card = self.conn.get_object(Card, data['card']['id'])
+                cards[card._id] = card
+                if not self.apply(card, data):
+                    stale.append((card, data))
+            elif kind in CARD_REMOVALS and 'card' in data:
+                card = self.conn.get_object(Card, data['card']['id'])
+                cards[card._id] = None
+                self.conn.invalidate(card)
+                self.remove_card(card._id)
+            elif kind in LIST_ACTIONS and 'list' in data:
+                lst = self.conn.get_object(List, data['list']['id'])
+                lists[lst._id] = lst
+                if not self.apply(lst, data):
+                    stale.append((lst, data))
+            elif kind in LIST_REMOVALS and 'list' in data:
+                lists[data['list']['id']] = None
+                self.remove_list(data['list']['id'])
+
+        if fetch:
+            # fetch_many skips what's cached, so drop the stale copies first.
+            for obj, _ in stale:
+                self.conn.forget(obj._path)
+            self.conn.fetch_many([obj for obj, _ in stale])
+        else:
+            for obj, data in stale:
+                self.evict(obj, data)
+                if isinstance(obj, Card):
+                    cards[obj._id] = None
+                else:
+                    lists[obj._id] = None
+
+        for lst in lists.values():
+            if lst is not None:
+                self.place_list(lst)
+        for card in cards.values():
+            if card is not None:
+                self.place_card(card)
+
+        self.persist()
+        self.last_action = actions[-1]['id']
+        return actions
+
+    def evict(self, obj, data):
+        """
+        Drop a card or list from the cache, along with the cached sublists
+        it's in, or may now be in according to an action's data.
+        """
+        self.conn.invalidate(obj)
+        if isinstance(obj, List):
+            self.conn.forget(self.path(self.board, 'lists'))
+            return
+        self.conn.forget(self.path(self.board, 'cards'))
+        list_ids = set(data[key]['id'] for key in ('list', 'listBefore',
+                                                   'listAfter')
+                       if 'id' in data.get(key, {}))
+        for lst in self.sublist(self.board, 'lists') or []:
+            if obj in (self.sublist(lst, 'cards') or ()):
+                list_ids.add(lst._id)
+        for list_id in list_ids:
+            lst = self.conn.get_object(List, list_id)
+            self.conn.forget(self.path(lst, 'cards'))
+
+    def apply(self, obj, data):
+        """
+        Apply the changed fields of an update action to obj's cached data in
+        place.  Returns False if that isn't possible and obj must be fetched
+        again.
+        """
+        cached = self.conn.cache.get(obj._path)
+        old = data.get('old')
+        if cached is None or not old:
+            return False
+        key = 'card' if isinstance(obj, Card) else 'list'
+        new = data[key]
+        for field in old:
+            if field not in new:
+                return False
+            cached[field] = new[field]
+        self.conn.remember(obj._path, cached)
+        return True
+
+    def persist(self):
+        """
+        Write the board's synced sublists back to the connection's store, if
+        it has one.
+        """
+        if self.conn.store is None:
+            return
+        lists = self.sublist(self.board, 'lists') or []
+        for obj, name in [(self.board, 'cards'), (self.board, 'lists')] + \
+                [(lst, 'cards') for lst in lists]:
+            objs = self.sublist(obj, name)
+            if objs is not None:
+                self.conn.remember(self.path(obj, name), objs,
+                                   [o._data for o in objs])
+
+    def belongs(self, data):
+        """Whether a card or list with this data is open on the board."""
+        board_id = data.get('idBoard', self.board._id)
+        return board_id == self.board._id and not data.get('closed')
+
+    def path(self, obj, name):
+        """Return the path of obj's sublist called name."""
+        return get_sublist(type(obj), name).path(obj)
+
+    def sublist(self, obj, name):
+        """Return obj's cached sublist called name, or None."""
+        return self.conn.cache.get(self.path(obj, name))
+
+    def remove_card(self, card_id):
+        with self.conn._sublist_lock:
+            board_cards = self.sublist(self.board, 'cards')
+            if board_cards is not None:
+                board_cards[:] = [c for c in board_cards if c._id != card_id]
+            for lst in self.sublist(self.board, 'lists') or []:
+                cards = self.sublist(lst, 'cards')
+                if cards is not None:
+                    cards[:] = [c for c in cards if c._id != card_id]
+
+    def remove_list(self, list_id):
+        with self.conn._sublist_lock:
+            lists = self.sublist(self.board, 'lists')
+            if lists is not None:
+                lists[:] = [l for l in lists if l._id != list_id]
+
+    def place_card(self, card):
+        """
+        Put card in the board's and its list's cached card lists, where it
+        belongs according to its data, and out of any others.
+        """
+        # Under the lock that guards the connection's own changes to cached
+        # sublists, like TrelloConnection.add_created's.
+        with self.conn._sublist_lock:
+            self.remove_card(card._id)
+            # If it couldn't be fetched, it's presumably gone.
+            if card._path not in self.conn.cache or \
+                    not self.belongs(card._data):
+                return
+
+            board_cards = self.sublist(self.board, 'cards')
+            if board_cards is not None:
+                board_cards.append(card)
+            lst = self.conn.get_object(List, card._data['idList'])
+            cards = self.sublist(lst, 'cards')
+            if cards is not None:
+                cards.append(card)
+                cards.sort(key=cached_position)
+
+    def place_list(self, lst):
+        """
+        Put lst in the board's cached lists, or take it out if it's been
+        closed or moved away.
+        """
+        with self.conn._sublist_lock:
+            self.remove_list(lst._id)
+            if lst._path not in self.conn.cache or \
+                    not self.belongs(lst._data):
+                return
+            lists = self.sublist(self.board, 'lists')
+            if lists is not None:
+                lists.append(lst)
+                lists.sort(key=cached_position)
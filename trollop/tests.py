@@ -1,7 +1,11 @@
 # -*- coding: utf-8 -*-
 import unittest
 import json
-import urlparse
+import os
+import time
+
+import six
+from six.moves.urllib import parse as urlparse
 
 import trollop
 from trollop import TrelloConnection
@@ -15,6 +19,10 @@ class AttrDict(dict):
     def raise_for_status(self):
         pass
 
+    @property
+    def content(self):
+        return self.get('text', '').encode('utf-8')
+
 class FakeRequest(object):
     """Mock for requests.session.request.  Init it with the headers and data
     that you want to get back when calling session.request.  Keeps a history of
@@ -34,7 +42,7 @@ class FakeRequest(object):
                              text=json.dumps(self.data[path]),
                              status_code=200)
         except KeyError:
-            return AttrDict(status_code=404)
+            return AttrDict(headers={}, status_code=404)
 
 
 class TrollopTestCase(unittest.TestCase):
@@ -128,3 +136,1484 @@ class TestUnicode(object):
 
         t_obj = TestObject(None, 'id', {'name': u'łßöżź'})
         str(t_obj)
+
+
+class CacheTests(TrollopTestCase):
+    data = {'/1/boards/fakeboard1/cards/':
+                [{'id': 'fakecard1', 'name': 'Fake Card 1'}],
+            '/1/cards/fakecard2': {'id': 'fakecard2', 'name': 'Fake Card 2'},
+            '/1/boards/bigboard/cards/':
+                [{'id': 'bigcard%s' % i, 'name': 'Big Card %s' % i}
+                 for i in range(20)]}
+
+    def test_sublist_cached_per_connection(self):
+        board = self.conn.get_board('fakeboard1')
+        assert board.cards[0].name == 'Fake Card 1'
+        assert board.cards[0].name == 'Fake Card 1'
+        assert len(self.conn.session.request.history) == 1
+
+        # A second connection has its own cache, and must fetch again.
+        other = TrelloConnection('blah', 'blerg')
+        other.session.request = FakeRequest(self.headers, self.data)
+        assert other.get_board('fakeboard1').cards[0].name == 'Fake Card 1'
+        assert len(other.session.request.history) == 1
+
+    def test_data_cached_and_invalidated(self):
+        card = self.conn.get_card('fakecard2')
+        assert card.name == 'Fake Card 2'
+        assert self.conn.get_card('fakecard2').name == 'Fake Card 2'
+        assert len(self.conn.session.request.history) == 1
+
+        self.conn.invalidate(card)
+        assert card.name == 'Fake Card 2'
+        assert len(self.conn.session.request.history) == 2
+
+    def test_sublist_evicted_with_its_data(self):
+        conn = TrelloConnection('blah', 'blerg',
+                                cache=trollop.Cache(max_size=10))
+        conn.session.request = FakeRequest(self.headers, self.data)
+        history = conn.session.request.history
+
+        # The sublist holds its cards' data, even with more cards than the
+        # cache has room for.
+        board = conn.get_board('bigboard')
+        names = [card.name for card in board.cards]
+        assert len(names) == 20
+        assert len(history) == 1
+
+        # Caching anything else evicts the sublist along with its cards, so
+        # they're fetched again in one request rather than one apiece.
+        assert conn.get_card('fakecard2').name == 'Fake Card 2'
+        assert '/boards/bigboard/cards/' not in conn.cache
+        assert [card.name for card in board.cards] == names
+        assert len(history) == 3
+
+    def test_expiry(self):
+        self.conn.cache.ttl = 0
+        card = self.conn.get_card('fakecard2')
+        card.name
+        card.name
+        assert len(self.conn.session.request.history) == 2
+
+
+class TestCache(object):
+    def test_lru_eviction(self):
+        cache = trollop.Cache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        assert 'a' in cache
+        assert 'b' not in cache
+        assert cache.evictions == 1
+
+    def test_children(self):
+        cache = trollop.Cache(max_size=4)
+        cache.set('list', ['a', 'b'], children=[('a', 1), ('b', 2)])
+        assert cache.get('a') == 1
+        cache.set('a', 3)
+        cache.invalidate('a')
+        assert 'a' not in cache and cache.get('b') == 2
+
+        # Evicting the list drops its children.
+        cache.set('c', 4)
+        cache.set('d', 5)
+        cache.set('e', 6)
+        assert 'list' not in cache and 'b' not in cache
+
+    def test_counters(self):
+        cache = trollop.Cache()
+        cache.set('a', 1)
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.stats() == {'size': 1, 'hits': 1, 'misses': 1,
+                                 'evictions': 0}
+
+
+class IdentityMapTests(TrollopTestCase):
+    data = {'/1/cards/fakecard1': {'id': 'fakecard1', 'idMembers': ['me1']},
+            '/1/cards/fakecard2': {'id': 'fakecard2', 'idMembers': ['me1']},
+            '/1/members/me1': {'id': 'me1', 'username': 'btubbs'}}
+
+    def test_same_instance(self):
+        assert self.conn.get_card('fakecard1') is self.conn.get_card('fakecard1')
+        assert self.conn.get_card('fakecard1') is not self.conn.get_card('fakecard2')
+
+    def test_related_objects_shared(self):
+        member1 = self.conn.get_card('fakecard1').members[0]
+        member2 = self.conn.get_card('fakecard2').members[0]
+        assert member1 is member2
+        assert member1.username == member2.username == 'btubbs'
+        paths = [urlparse.urlparse(r.url).path
+                 for r in self.conn.session.request.history]
+        assert paths.count('/1/members/me1') == 1
+
+    def test_dead_objects_dropped(self):
+        import gc
+        self.conn.get_card('fakecard1')
+        gc.collect()
+        assert len(self.conn._objects) == 0
+
+
+class PrefetchTests(TrollopTestCase):
+    data = {'/1/boards/fakeboard1': {
+        'id': 'fakeboard1',
+        'name': 'Fake Board 1',
+        'lists': [{'id': 'fakelist1', 'name': 'Fake List 1'},
+                  {'id': 'fakelist2', 'name': 'Fake List 2'}],
+        'cards': [{'id': 'fakecard1', 'name': 'Fake Card 1',
+                   'idList': 'fakelist1', 'idMembers': ['fakemember1'],
+                   'members': [{'id': 'fakemember1', 'username': 'btubbs'}]},
+                  {'id': 'fakecard2', 'name': 'Fake Card 2',
+                   'idList': 'fakelist2', 'idMembers': [], 'members': []}],
+    }}
+
+    def test_one_request(self):
+        board = self.conn.get_board('fakeboard1', prefetch=[
+            'lists', 'cards', 'cards.members', 'lists.cards'])
+
+        assert board.name == 'Fake Board 1'
+        assert [c.name for c in board.cards] == ['Fake Card 1', 'Fake Card 2']
+        assert board.lists[0].cards[0].members[0].username == 'btubbs'
+        assert [c.name for c in board.lists[1].cards] == ['Fake Card 2']
+        assert 'cards' not in board._data
+
+        history = self.conn.session.request.history
+        assert len(history) == 1
+        query = urlparse.parse_qs(urlparse.urlparse(history[0].url).query)
+        assert query['cards'] == ['visible']
+        assert query['card_members'] == ['true']
+        assert query['lists'] == ['open']
+
+    def test_dotted_names_imply_their_parents(self):
+        board = self.conn.get_board('fakeboard1', prefetch=['lists.cards'])
+        assert sorted(board._data) == ['id', 'name']
+        assert [c.name for c in board.lists[1].cards] == ['Fake Card 2']
+        board = self.conn.get_board('fakeboard1', prefetch=['cards.members'])
+        assert 'cards' not in board._data
+        assert board.cards[0].members[0].username == 'btubbs'
+        assert len(self.conn.session.request.history) == 2
+
+    def test_unknown_name(self):
+        board = self.conn.get_board('fakeboard1')
+        self.assertRaises(ValueError, board.prefetch, 'bogus')
+
+
+class FakeBatchRequest(FakeRequest):
+    """Like FakeRequest, but answers /1/batch calls by looking up each of the
+    requested urls in data."""
+
+    def __call__(self, method, url, *args, **kwargs):
+        parsed = urlparse.urlparse(url)
+        if parsed.path != '/1/batch':
+            return super(FakeBatchRequest, self).__call__(method, url,
+                                                          *args, **kwargs)
+        self.history.append(AttrDict(method=method, url=url))
+        urls = urlparse.parse_qs(parsed.query)['urls'][0].split(',')
+        results = []
+        for u in urls:
+            path, _, query = u.partition('?')
+            doc = self.data['/1' + path]
+            fields = urlparse.parse_qs(query).get('fields')
+            if fields:
+                keys = fields[0].split(',') + ['id']
+                doc = dict((k, v) for k, v in doc.items() if k in keys)
+            results.append({'200': doc})
+        return AttrDict(headers=self.headers, text=json.dumps(results),
+                        status_code=200)
+
+
+class BatchTests(TrollopTestCase):
+    data = {'/1/cards/fakecard1': {'id': 'fakecard1',
+                                   'idMembers': ['m1', 'm2', 'm3']},
+            '/1/members/m1': {'id': 'm1', 'username': 'one'},
+            '/1/members/m2': {'id': 'm2', 'username': 'two'},
+            '/1/members/m3': {'id': 'm3', 'username': 'three'}}
+
+    def setUp(self):
+        super(BatchTests, self).setUp()
+        self.conn.session.request = FakeBatchRequest(self.headers, self.data)
+
+    def test_fetch_many(self):
+        self.conn.batch_size = 2
+        members = self.conn.fetch_many(self.conn.get_card('fakecard1').members)
+        assert [m.username for m in members] == ['one', 'two', 'three']
+        # One request for the card, then two batches for the members.
+        assert len(self.conn.session.request.history) == 3
+
+    def test_skips_cached(self):
+        card = self.conn.get_card('fakecard1')
+        card.members[0].username
+        self.conn.fetch_many(card.members)
+        last = self.conn.session.request.history[-1]
+        query = urlparse.parse_qs(urlparse.urlparse(last.url).query)
+        assert query['urls'] == ['/members/m2,/members/m3']
+
+
+class FakeSequenceRequest(object):
+    """Mock for requests.session.request that returns the given responses in
+    order, recording each request made."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.history = []
+
+    def __call__(self, method, url, *args, **kwargs):
+        self.history.append(AttrDict(method=method, url=url))
+        return self.responses.pop(0)
+
+
+class RateLimitTests(TrollopTestCase):
+
+    def setUp(self):
+        super(RateLimitTests, self).setUp()
+        self.conn.limiter = trollop.RateLimiter(backoff=0)
+
+    def response(self, status, headers=None, data=None):
+        return AttrDict(headers=headers or {}, status_code=status,
+                        text=json.dumps(data))
+
+    def test_retries_get(self):
+        self.conn.session.request = FakeSequenceRequest(
+            self.response(503), self.response(429),
+            self.response(200, data={'id': 'fakecard1'}))
+        assert self.conn.get_card('fakecard1')._data == {'id': 'fakecard1'}
+        assert len(self.conn.session.request.history) == 3
+        assert self.conn.limiter.retries == 2
+
+    def test_no_retry_post_on_server_error(self):
+        self.conn.session.request = FakeSequenceRequest(
+            self.response(500), self.response(200))
+        self.conn.post('/cards', {'name': 'x'})
+        assert len(self.conn.session.request.history) == 1
+
+    def test_headers_drain_bucket(self):
+        self.conn.session.request = FakeSequenceRequest(self.response(
+            200, {'x-rate-limit-api-token-remaining': '0',
+                  'Retry-After': '30'}, {}))
+        self.conn.get('/members/me')
+        limiter = self.conn.limiter
+        assert limiter._tokens == 0
+        assert limiter._blocked_until > time.time() + 20
+
+
+class ConcurrencyTests(TrollopTestCase):
+    data = dict(('/1/boards/fakeboard%d' % i,
+                 {'id': 'fakeboard%d' % i, 'name': 'Fake Board %d' % i})
+                for i in range(20))
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_map_load(self):
+        boards = [self.conn.get_board('fakeboard%d' % i) for i in range(20)]
+        boards[0].name
+        self.conn.map_load(boards + boards)
+        assert len(self.conn.session.request.history) == 20
+        assert [b.name for b in boards] == ['Fake Board %d' % i
+                                            for i in range(20)]
+        assert len(self.conn.session.request.history) == 20
+
+    def test_get_async(self):
+        future = self.conn.get_async('/boards/fakeboard3')
+        assert json.loads(future.result())['name'] == 'Fake Board 3'
+
+    def test_identity_map_across_threads(self):
+        futures = [self.conn.executor.submit(self.conn.get_board, 'fakeboard1')
+                   for i in range(20)]
+        boards = set(id(f.result()) for f in futures)
+        assert len(boards) == 1
+
+    def test_identical_gets_share_a_request(self):
+        import threading
+        release = threading.Event()
+        fake = self.conn.session.request
+
+        def slow_request(*args, **kwargs):
+            release.wait(5)
+            return fake(*args, **kwargs)
+
+        self.conn.session.request = slow_request
+        board = self.conn.get_board('fakeboard1')
+        futures = [self.conn.executor.submit(lambda: board.name)
+                   for i in range(5)]
+        # Let the request finish once the other four are waiting on it.
+        stats = lambda: self.conn.metrics()['requests'].get('/boards/fakeboard1')
+        for i in range(500):
+            if stats() and stats()['shared'] == 4:
+                break
+            time.sleep(0.01)
+        release.set()
+        assert [f.result() for f in futures] == ['Fake Board 1'] * 5
+        assert len(fake.history) == 1
+        assert stats()['shared'] == 4
+
+
+@unittest.skipIf(six.PY2, "asyncio support needs Python 3")
+class AsyncTests(unittest.TestCase):
+    data = {'/1/boards/fakeboard1': {'id': 'fakeboard1', 'name': 'Board'},
+            '/1/boards/fakeboard1/cards/':
+                [{'id': 'fakecard1', 'name': 'Fake Card 1',
+                  'idMembers': ['m1', 'm2']}],
+            '/1/members/m1': {'id': 'm1', 'username': 'one'},
+            '/1/members/m2': {'id': 'm2', 'username': 'two'}}
+
+    def setUp(self):
+        from trollop.aio import AsyncTrelloConnection
+        self.conn = AsyncTrelloConnection('blah', 'blerg', concurrency=2)
+        self.conn.session.request = FakeRequest({}, self.data)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def run_async(self, coro):
+        import asyncio
+        return asyncio.run(coro)
+
+    def test_load_and_fetch(self):
+        async def go():
+            board = await self.conn.get_board('fakeboard1').load()
+            cards = await board.fetch('cards')
+            members = await self.conn.map_load(cards[0].members)
+            return board.name, [m.username for m in members]
+        assert self.run_async(go()) == ('Board', ['one', 'two'])
+        assert len(self.conn.session.request.history) == 4
+
+    def test_one_connection_many_loops(self):
+        # Each asyncio.run has a new event loop, which mustn't trip over a
+        # semaphore left from the last.
+        self.conn.concurrency = 1
+        for i in range(2):
+            self.conn.cache.clear()
+            members = [self.conn.get_member('m1'), self.conn.get_member('m2')]
+            self.run_async(self.conn.map_load(members))
+            assert [m.username for m in members] == ['one', 'two']
+
+    def test_lazy_access_in_loop_raises(self):
+        from trollop.aio import BlockingFetchError
+
+        async def go():
+            return self.conn.get_board('fakeboard1').name
+        self.assertRaises(BlockingFetchError, self.run_async, go())
+        assert self.conn.session.request.history == []
+
+    def test_lazy_access_outside_loop(self):
+        assert self.conn.get_board('fakeboard1').name == 'Board'
+
+
+class FakeActionPages(object):
+    """Mock for requests.session.request serving a board's actions newest
+    first, honouring the limit (up to Trello's 1000) and before params."""
+
+    def __init__(self, count):
+        self.actions = [{'id': '%04d' % i, 'type': 'commentCard'}
+                        for i in reversed(range(count))]
+        self.history = []
+
+    def __call__(self, method, url, *args, **kwargs):
+        self.history.append(AttrDict(method=method, url=url))
+        query = urlparse.parse_qs(urlparse.urlparse(url).query)
+        actions = self.actions
+        if 'before' in query:
+            actions = [a for a in actions if a['id'] < query['before'][0]]
+        actions = actions[:min(int(query['limit'][0]), 1000)]
+        content = json.dumps(actions).encode('utf-8')
+        # Streamed responses arrive in small pieces.
+        chunks = lambda size: (content[i:i + 7]
+                               for i in range(0, len(content), 7))
+        return AttrDict(headers={}, status_code=200, text=json.dumps(actions),
+                        iter_content=chunks, close=lambda: None)
+
+
+class PaginationTests(TrollopTestCase):
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_iter_actions(self):
+        self.conn.session.request = FakeActionPages(25)
+        board = self.conn.get_board('fakeboard1')
+        ids = [a._id for a in board.iter_actions(page_size=10)]
+        assert ids == ['%04d' % i for i in reversed(range(25))]
+        assert len(self.conn.session.request.history) == 3
+        # Streamed actions aren't kept in the cache.
+        assert len(self.conn.cache) == 0
+
+    def test_page_size_over_limit(self):
+        self.conn.session.request = FakeActionPages(2500)
+        board = self.conn.get_board('fakeboard1')
+        for stream in (False, True):
+            actions = list(board.iter_sublist('actions', page_size=5000,
+                                              stream=stream))
+            assert len(actions) == 2500
+        history = self.conn.session.request.history
+        assert len(history) == 6
+        assert all('limit=1000' in r.url for r in history)
+
+    def test_prefetch_and_before(self):
+        self.conn.session.request = FakeActionPages(25)
+        board = self.conn.get_board('fakeboard1')
+        actions = list(board.iter_actions(before='0020', page_size=10,
+                                          prefetch=True))
+        assert [a.type for a in actions] == ['commentCard'] * 20
+        assert actions[-1]._id == '0000'
+
+    def test_stream(self):
+        self.conn.session.request = FakeActionPages(25)
+        board = self.conn.get_board('fakeboard1')
+        actions = board.iter_sublist('actions', page_size=10, stream=True)
+        assert [a._id for a in actions] == ['%04d' % i
+                                            for i in reversed(range(25))]
+        assert len(self.conn.session.request.history) == 3
+
+    def test_compact(self):
+        self.conn.session.request = FakeActionPages(5)
+        for action in self.conn.session.request.actions:
+            action['memberCreator'] = {'id': 'm1', 'fullName': 'Someone'}
+        board = self.conn.get_board('fakeboard1')
+        actions = list(board.iter_sublist('actions', compact=True))
+        assert [sorted(a._data) for a in actions] == [['id', 'type']] * 5
+        # Trello objects don't carry a __dict__ around.
+        assert not hasattr(actions[0], '__dict__')
+
+
+class BoardSyncTests(TrollopTestCase):
+
+    def setUp(self):
+        super(BoardSyncTests, self).setUp()
+        self.data = {
+            '/1/boards/b1': {
+                'id': 'b1', 'name': 'Board',
+                'lists': [{'id': 'l1', 'pos': 1}, {'id': 'l2', 'pos': 2}],
+                'cards': [{'id': 'c1', 'name': 'One', 'idList': 'l1',
+                           'idBoard': 'b1', 'closed': False, 'pos': 1},
+                          {'id': 'c2', 'name': 'Two', 'idList': 'l1',
+                           'idBoard': 'b1', 'closed': False, 'pos': 2}]},
+            '/1/boards/b1/actions/': [{'id': 'a1', 'type': 'createBoard'}],
+            '/1/cards/c3': {'id': 'c3', 'name': 'Three', 'idList': 'l2',
+                            'idBoard': 'b1', 'closed': False, 'pos': 1},
+        }
+        self.conn.session.request = FakeBatchRequest({}, self.data)
+        self.board = self.conn.get_board('b1')
+
+    def test_poll(self):
+        from trollop.sync import BoardSync
+        sync = BoardSync(self.board).start()
+        assert sync.last_action == 'a1'
+
+        # Newest first, as Trello returns them.
+        self.data['/1/boards/b1/actions/'] = [
+            {'id': 'a5', 'type': 'updateCard',
+             'data': {'card': {'id': 'c1', 'closed': True},
+                      'old': {'closed': False}}},
+            {'id': 'a4', 'type': 'createCard',
+             'data': {'card': {'id': 'c3'}, 'list': {'id': 'l2'}}},
+            {'id': 'a3', 'type': 'updateCard',
+             'data': {'card': {'id': 'c2', 'idList': 'l2'},
+                      'old': {'idList': 'l1'}}},
+            {'id': 'a2', 'type': 'updateCard',
+             'data': {'card': {'id': 'c1', 'name': 'Uno'},
+                      'old': {'name': 'One'}}},
+        ]
+        requests_before = len(self.conn.session.request.history)
+        applied = sync.poll()
+
+        assert [a['id'] for a in applied] == ['a2', 'a3', 'a4', 'a5']
+        assert sync.last_action == 'a5'
+        # One request for the actions, one batch for the new card.
+        assert len(self.conn.session.request.history) == requests_before + 2
+
+        lists = self.board.lists
+        assert [c._id for c in lists[0].cards] == []
+        assert [c._id for c in lists[1].cards] == ['c3', 'c2']
+        assert sorted(c._id for c in self.board.cards) == ['c2', 'c3']
+        assert self.conn.get_card('c1').name == 'Uno'
+        assert len(self.conn.session.request.history) == requests_before + 2
+
+    def test_poll_fetches_cached_cards_changed_without_old_values(self):
+        from trollop.sync import BoardSync
+        sync = BoardSync(self.board).start()
+        card = self.conn.get_card('c1')
+        assert card._data.get('idMembers', []) == []
+
+        self.data['/1/cards/c1'] = dict(card._data, idMembers=['m1'])
+        self.data['/1/boards/b1/actions/'] = [
+            {'id': 'a2', 'type': 'addMemberToCard',
+             'data': {'card': {'id': 'c1'}, 'idMember': 'm1'}}]
+        requests_before = len(self.conn.session.request.history)
+        sync.poll()
+
+        assert len(self.conn.session.request.history) == requests_before + 2
+        assert card._data['idMembers'] == ['m1']
+        assert [c._id for c in self.board.lists[0].cards] == ['c1', 'c2']
+
+
+class StoreTests(TrollopTestCase):
+    data = {'/1/boards/fakeboard1/cards/':
+                [{'id': 'fakecard1', 'name': 'Fake Card 1'}],
+            '/1/cards/fakecard2': {'id': 'fakecard2', 'name': 'Fake Card 2'}}
+
+    def setUp(self):
+        import tempfile
+        from trollop.store import SQLiteStore
+        self.tmpdir = tempfile.mkdtemp()
+        self.path = self.tmpdir + '/trollop.db'
+        self.conn = self.connect(SQLiteStore(self.path))
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.tmpdir)
+
+    def connect(self, store):
+        conn = TrelloConnection('blah', 'blerg', store=store)
+        conn.session.request = FakeRequest(self.headers, self.data)
+        return conn
+
+    def test_warm_start(self):
+        from trollop.store import SQLiteStore
+        assert self.conn.get_board('fakeboard1').cards[0].name == 'Fake Card 1'
+        assert self.conn.get_card('fakecard2').name == 'Fake Card 2'
+
+        # A new connection, as in a new process, reads from the store.
+        conn = self.connect(SQLiteStore(self.path))
+        assert conn.get_board('fakeboard1').cards[0].name == 'Fake Card 1'
+        assert conn.get_card('fakecard2').name == 'Fake Card 2'
+        assert conn.session.request.history == []
+
+    def test_stale_entries_refetched(self):
+        from trollop.store import SQLiteStore
+        self.conn.get_card('fakecard2').name
+        conn = self.connect(SQLiteStore(self.path, max_age=0))
+        assert conn.get_card('fakecard2').name == 'Fake Card 2'
+        assert len(conn.session.request.history) == 1
+
+    def test_invalidate(self):
+        card = self.conn.get_card('fakecard2')
+        card.name
+        self.conn.invalidate(card)
+        assert self.conn.store.get('/cards/fakecard2') is None
+
+
+class ProjectionTests(TrollopTestCase):
+
+    def setUp(self):
+        super(ProjectionTests, self).setUp()
+        # Serve only the fields asked for, like Trello does.
+        fake = self.conn.session.request
+        docs = {'/1/boards/b1/cards/': [{'id': 'c1', 'name': 'One',
+                                         'idList': 'l1', 'desc': 'Long'}],
+                '/1/cards/c1': {'id': 'c1', 'name': 'One', 'idList': 'l1',
+                                'desc': 'Long'}}
+
+        def request(method, url, *args, **kwargs):
+            parsed = urlparse.urlparse(url)
+            fake.history.append(AttrDict(method=method, url=url))
+            query = urlparse.parse_qs(parsed.query)
+            fields = query.get('fields', [None])[0]
+
+            def project(doc):
+                if fields is None:
+                    return doc
+                keys = ['id'] + fields.split(',')
+                return dict((k, v) for k, v in doc.items() if k in keys)
+            data = docs[parsed.path]
+            if isinstance(data, list):
+                data = [project(d) for d in data]
+            else:
+                data = project(data)
+            return AttrDict(headers={}, status_code=200, text=json.dumps(data))
+        self.history = fake.history
+        self.conn.session.request = request
+
+    def test_sublist_projection(self):
+        board = self.conn.get_board('b1')
+        cards = board.fetch('cards', fields=['name', 'idList'])
+        assert cards[0].name == 'One'
+        assert 'desc' not in cards[0]._data
+        query = urlparse.parse_qs(urlparse.urlparse(self.history[0].url).query)
+        assert query['fields'] == ['name,idList']
+
+        # Reading a field outside the projection fetches only that field.
+        assert cards[0].desc == 'Long'
+        assert len(self.history) == 2
+        query = urlparse.parse_qs(urlparse.urlparse(self.history[1].url).query)
+        assert query['fields'] == ['desc']
+        assert board.cards[0].desc == 'Long'
+        assert len(self.history) == 2
+
+    def test_getter_projection(self):
+        card = self.conn.get_card('c1', fields=['name'])
+        assert card._data == {'id': 'c1', 'name': 'One'}
+        card.load()
+        assert card.desc == 'Long'
+        assert len(self.history) == 2
+
+    def test_missing_field_is_not_refetched(self):
+        card = self.conn.get_card('c1')
+        assert card.name == 'One'
+        for i in range(3):
+            self.assertRaises(KeyError, lambda: card.due)
+        # One request for the card, and one for the missing field.
+        assert len(self.history) == 2
+
+        # What's missing is forgotten along with the data, and with the
+        # least recently used objects once there are too many.
+        self.conn.forget(card._path)
+        assert card._path not in self.conn._missing
+        assert self.conn._missing.max_size == self.conn.cache.max_size
+
+
+@unittest.skipIf(six.PY2, "asyncio support needs Python 3")
+class AsyncProjectionTests(ProjectionTests):
+    """The same, through an AsyncTrelloConnection outside an event loop."""
+
+    def setUp(self):
+        from trollop.aio import AsyncTrelloConnection
+        super(AsyncProjectionTests, self).setUp()
+        request = self.conn.session.request
+        self.conn = AsyncTrelloConnection('blah', 'blerg')
+        self.conn.session.request = request
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_sublist_projection(self):
+        import asyncio
+        board = self.conn.get_board('b1')
+        cards = asyncio.run(board.fetch('cards', fields=['name', 'idList']))
+        assert 'desc' not in cards[0]._data
+        assert cards[0].desc == 'Long'
+        assert len(self.history) == 2
+
+    def test_getter_projection(self):
+        import asyncio
+        card = self.conn.get_card('c1', fields=['name'])
+        assert card._data == {'id': 'c1', 'name': 'One'}
+        asyncio.run(card.load())
+        assert card.desc == 'Long'
+        assert len(self.history) == 2
+
+    def test_getter_projection_fetches(self):
+        import warnings
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            card = self.conn.get_card('c1', fields=['name'])
+            assert len(self.history) == 1
+            assert card.desc == 'Long'
+        assert len(self.history) == 2
+
+    def test_projection_in_event_loop(self):
+        import asyncio
+        from trollop.aio import BlockingFetchError
+
+        async def get():
+            return self.conn.get_card('c1', fields=['name'])
+        self.assertRaises(BlockingFetchError, asyncio.run, get())
+
+        async def read():
+            card = await self.conn.get_card('c1').load(fields=['name'])
+            assert card.name == 'One'
+            return card.desc
+        self.assertRaises(BlockingFetchError, asyncio.run, read())
+        assert len(self.history) == 1
+
+
+class SaveTests(TrollopTestCase):
+
+    def setUp(self):
+        super(SaveTests, self).setUp()
+        self.docs = {
+            '/1/lists/l1/cards/': [{'id': 'c1', 'name': 'One', 'idList': 'l1',
+                                    'closed': False, 'pos': 1}],
+            '/1/lists/l2/cards/': [{'id': 'c2', 'name': 'Two', 'idList': 'l2',
+                                    'closed': False, 'pos': 2}],
+        }
+        self.history = []
+
+        def request(method, url, data=None, *args, **kwargs):
+            path = urlparse.urlparse(url).path
+            self.history.append(AttrDict(method=method, url=url, data=data))
+            if method == 'PUT':
+                doc = [c for c in self.docs['/1/lists/l1/cards/']
+                       if '/1/cards/' + c['id'] == path][0]
+                doc = dict(doc, **json.loads(data))
+                return AttrDict(headers={}, status_code=200,
+                                text=json.dumps(doc))
+            return AttrDict(headers={}, status_code=200,
+                            text=json.dumps(self.docs[path]))
+        self.conn.session.request = request
+
+    def test_save_coalesces_and_updates_cache(self):
+        l1 = self.conn.get_list('l1')
+        l2 = self.conn.get_list('l2')
+        card = l1.cards[0]
+        l2.cards
+
+        card.name = 'Uno'
+        card.list = l2
+        assert card.dirty
+        assert card.name == 'Uno'
+        assert len(self.history) == 2
+
+        card.save()
+        assert not card.dirty
+        assert len(self.history) == 3
+        put = self.history[-1]
+        assert put.method == 'PUT'
+        assert json.loads(put.data) == {'name': 'Uno', 'idList': 'l2'}
+
+        assert card.name == 'Uno'
+        assert l1.cards == []
+        assert [c._id for c in l2.cards] == ['c1', 'c2']
+        assert len(self.history) == 3
+
+    def test_save_does_not_load_evicted_siblings(self):
+        card = self.conn.get_list('l1').cards[0]
+        l2 = self.conn.get_list('l2')
+        l2.cards
+        self.conn.cache.invalidate('/cards/c2')
+
+        card.list = l2
+        card.save()
+        assert [h.method for h in self.history] == ['GET', 'GET', 'PUT']
+        assert sorted(c._id for c in l2.cards) == ['c1', 'c2']
+
+    def test_label_paths(self):
+        label = self.conn.get_object(trollop.Label, 'lb1')
+        assert label._path == '/labels/lb1'
+        card = self.conn.get_object(trollop.Card, 'c1')
+        assert trollop.Card.labels.path(card) == '/cards/c1/labels/'
+
+    def test_flush(self):
+        card = self.conn.get_list('l1').cards[0]
+        card.closed = True
+        self.conn.flush()
+        assert self.history[-1].method == 'PUT'
+        assert self.conn.get_list('l1').cards == []
+        self.conn.flush()
+        assert len(self.history) == 2
+
+    def test_read_only(self):
+        card = self.conn.get_list('l1').cards[0]
+
+        def assign():
+            card.url = 'http://example.com'
+        self.assertRaises(AttributeError, assign)
+
+
+class BulkTests(TrollopTestCase):
+
+    def setUp(self):
+        super(BulkTests, self).setUp()
+        self.history = []
+
+        def request(method, url, *args, **kwargs):
+            parsed = urlparse.urlparse(url)
+            self.history.append(AttrDict(method=method, url=url))
+            if method == 'GET':
+                return AttrDict(headers={}, status_code=200, text='[]')
+            query = urlparse.parse_qs(parsed.query)
+            name = query['name'][0]
+            if name == 'bad':
+                raise ValueError(name)
+            doc = {'id': 'id-' + name, 'name': name, 'pos': int(name),
+                   'idList': query['idList'][0], 'closed': False}
+            return AttrDict(headers={}, status_code=200, text=json.dumps(doc))
+        self.conn.session.request = request
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_add_cards(self):
+        lst = self.conn.get_list('l1')
+        assert lst.cards == []
+        names = [str(i) for i in range(30)]
+        results = lst.add_cards(names[:10] + ['bad'] + names[10:], window=4)
+
+        assert [r.op for r in results] == names[:10] + ['bad'] + names[10:]
+        assert isinstance(results[10].error, ValueError)
+        created = [r.result for r in results if r.error is None]
+        assert [c.name for c in created] == names
+        assert [c._id for c in lst.cards] == ['id-' + n for n in names]
+
+    def test_add_cards_finishing_out_of_order(self):
+        lst = self.conn.get_list('l1')
+        assert lst.cards == []
+        request = self.conn.session.request
+
+        def slow_request(method, url, *args, **kwargs):
+            if method == 'POST':
+                # Later cards are created first.
+                name = urlparse.parse_qs(urlparse.urlparse(url).query)['name']
+                time.sleep(0.001 * (20 - int(name[0])))
+            return request(method, url, *args, **kwargs)
+        self.conn.session.request = slow_request
+
+        names = [str(i) for i in range(20)]
+        results = lst.add_cards(reversed(names), window=20)
+        assert [r.error for r in results] == [None] * 20
+        assert [c._id for c in lst.cards] == ['id-' + n for n in names]
+
+    def test_add_card(self):
+        card = self.conn.get_list('l1').add_card('7')
+        assert card.name == '7'
+        assert self.history[-1].method == 'POST'
+
+
+class StatsTests(TrollopTestCase):
+    data = dict([('/1/cards/%024x' % i,
+                  {'id': '%024x' % i, 'name': 'Card %d' % i,
+                   'idMembers': ['m1']})
+                 for i in range(5)] +
+                [('/1/boards/b1/cards/', [{'id': 'c1', 'name': 'One'}])])
+
+    def test_endpoint_stats_and_triggers(self):
+        events = []
+        self.conn.add_hook(events.append)
+        for i in range(5):
+            self.conn.get_card('%024x' % i).name
+        self.conn.get_board('b1').cards
+
+        stats = self.conn.metrics()['requests']['/cards/:id']
+        assert stats['requests'] == 5
+        assert stats['lazy_loads'] == 5
+        assert stats['bytes_received'] > 0
+        assert sum(count for bound, count in stats['histogram']) == 5
+        assert [e.trigger for e in events] == ['Card.name'] * 5 + \
+            ['Board.cards']
+
+    def test_n_plus_one_warning(self):
+        import warnings
+        from trollop.stats import NPlusOneWarning
+        self.conn.stats.n_plus_one_threshold = 3
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            for i in range(5):
+                self.conn.get_card('%024x' % i).name
+        caught = [w for w in caught if w.category is NPlusOneWarning]
+        assert len(caught) == 1
+        assert 'Card.name' in str(caught[0].message)
+
+    def test_tracing_hook(self):
+        from trollop.stats import TracingHook
+        spans = []
+
+        class FakeSpan(AttrDict):
+            def set_attribute(self, key, value):
+                self[key] = value
+
+            def end(self, end_time):
+                self['end_time'] = end_time
+                spans.append(self)
+
+        class FakeTracer(object):
+            def start_span(self, name, start_time):
+                return FakeSpan(name=name, start_time=start_time)
+
+        self.conn.add_hook(TracingHook(FakeTracer()))
+        self.conn.get_card('%024x' % 0).name
+        assert spans[0].name == 'trello GET /cards/:id'
+        assert spans[0]['trollop.trigger'] == 'Card.name'
+        assert spans[0].end_time >= spans[0].start_time
+
+
+class ExportTests(TrollopTestCase):
+    data = {
+        '/1/boards/b1/cards/': [
+            {'id': 'c1', 'name': 'One', 'closed': False, 'idMembers': ['m1'],
+             'due': '2024-01-02T03:04:05.500Z'},
+            {'id': 'c2', 'name': 'Two', 'closed': True, 'idMembers': [],
+             'due': None}],
+        '/1/boards/b1/actions/': [
+            {'id': 'a2', 'type': 'commentCard', 'data': {'text': 'Hi'},
+             'date': '2024-01-01T00:00:00.000Z'},
+            {'id': 'a1', 'type': 'createCard', 'data': {},
+             'date': '2023-12-31T00:00:00.000+01:00'}],
+    }
+
+    def setUp(self):
+        super(ExportTests, self).setUp()
+        from trollop import export
+        self.export = export
+        # Check the plain array columns, whether or not NumPy is installed.
+        self.numpy, export.numpy = export.numpy, None
+
+    def tearDown(self):
+        self.export.numpy = self.numpy
+
+    def test_export_board(self):
+        board = self.conn.get_board('b1')
+        tables = self.export.export_board(board, kinds=['cards', 'actions'])
+        cards = tables['cards']
+        assert len(cards) == 2
+        assert list(cards.columns)[0] == 'id'
+        assert cards['name'] == ['One', 'Two']
+        assert cards['idMembers'] == [['m1'], []]
+        assert cards['due'][0] == 1704164645.5
+        assert cards['due'][1] != cards['due'][1]   # NaN
+        actions = tables['actions']
+        assert list(actions['date']) == [1704067200.0, 1703977200.0]
+        # Only the declared fields are asked for, and nothing is cached.
+        query = urlparse.parse_qs(
+            urlparse.urlparse(self.conn.session.request.history[0].url).query)
+        assert 'due' in query['fields'][0].split(',')
+        assert len(self.conn.cache) == 0
+
+    def test_chunks(self):
+        board = self.conn.get_board('b1')
+        chunks = list(self.export.iter_tables(board, 'cards', chunk_size=1))
+        assert [c['id'] for c in chunks] == [['c1'], ['c2']]
+
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+@unittest.skipIf(numpy is None, "needs NumPy")
+class NumPyExportTests(TrollopTestCase):
+    data = ExportTests.data
+
+    def test_date_columns(self):
+        import warnings
+        from trollop import export
+        board = self.conn.get_board('b1')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            tables = export.export_board(board, kinds=['cards', 'actions'])
+        due = tables['cards']['due']
+        assert due.dtype == numpy.dtype('datetime64[ms]')
+        assert str(due[0]) == '2024-01-02T03:04:05.500'
+        assert numpy.isnat(due[1])
+        # The offset date is converted to UTC.
+        assert [str(d) for d in tables['actions']['date']] == [
+            '2024-01-01T00:00:00.000', '2023-12-30T23:00:00.000']
+
+
+@unittest.skipIf(pyarrow is None, "needs pyarrow")
+class ArrowExportTests(TrollopTestCase):
+    data = ExportTests.data
+
+    def test_to_arrow(self):
+        from trollop import export
+        board = self.conn.get_board('b1')
+        table = export.export_board(board, kinds=['cards'])['cards'].to_arrow()
+        assert table.num_rows == 2
+        assert str(table.schema.field('due').type) == 'timestamp[ms, tz=UTC]'
+        assert table.column('idMembers').to_pylist() == [['m1'], []]
+        assert table.column('name').to_pylist() == ['One', 'Two']
+
+    def test_write_parquet(self):
+        import shutil
+        import tempfile
+        import pyarrow.parquet
+        from trollop import export
+        directory = tempfile.mkdtemp()
+        try:
+            board = self.conn.get_board('b1')
+            # FakeRequest doesn't page, so actions come in one chunk.
+            paths = export.write_parquet(board, directory, kinds=['cards'],
+                                         chunk_size=1)
+            paths += export.write_parquet(board, directory, kinds=['actions'])
+            assert paths == [os.path.join(directory, 'cards.parquet'),
+                             os.path.join(directory, 'actions.parquet')]
+            cards = pyarrow.parquet.ParquetFile(paths[0])
+            assert cards.metadata.num_row_groups == 2
+            assert cards.read().column('id').to_pylist() == ['c1', 'c2']
+            actions = pyarrow.parquet.read_table(paths[1])
+            assert actions.column('type').to_pylist() == ['commentCard',
+                                                          'createCard']
+        finally:
+            shutil.rmtree(directory)
+
+
+class QueryTests(TrollopTestCase):
+
+    def setUp(self):
+        super(QueryTests, self).setUp()
+        def card(i, **fields):
+            data = dict(id='c%d' % i, idBoard='b1', idList='l1',
+                        closed=False, pos=i, idLabels=[], labels=[],
+                        idMembers=[], due=None)
+            data.update(fields)
+            return data
+
+        self.data = {
+            '/1/boards/b1/cards/': [
+                card(1, idLabels=['lb1'],
+                     labels=[{'id': 'lb1', 'color': 'red', 'name': 'Bug'}],
+                     idMembers=['m1'], due='2024-01-03T12:00:00.000Z'),
+                card(2, idMembers=['m1', 'm2'],
+                     due='2024-01-20T12:00:00.000Z'),
+                card(3, idList='l2', idMembers=['m2']),
+            ],
+            '/1/cards/c2': card(2, idList='l2', idMembers=['m2']),
+        }
+        self.conn.session.request = FakeBatchRequest({}, self.data)
+        self.board = self.conn.get_board('b1')
+
+    def ids(self, **criteria):
+        return [c._id for c in self.board.query(**criteria)]
+
+    def test_query(self):
+        import datetime
+        assert self.ids(label='red') == ['c1']
+        assert self.ids(label='Bug') == self.ids(label='lb1') == ['c1']
+        assert self.ids(member='m1') == ['c1', 'c2']
+        assert self.ids(list='l1', member=self.conn.get_member('m2')) == ['c2']
+        assert self.ids(due_after=datetime.date(2024, 1, 2),
+                        due_before=datetime.datetime(2024, 1, 10)) == ['c1']
+        assert self.ids(closed=True) == []
+        # Only the board's cards were fetched.
+        assert len(self.conn.session.request.history) == 1
+
+    def test_updated_incrementally(self):
+        assert self.ids(list='l2') == ['c3']
+        card = self.conn.get_card('c1')
+        self.conn.update_object(card, {'idList': 'l2', 'closed': True})
+        assert self.ids(list='l2') == ['c3']
+        assert self.ids(list='l2', closed=None) == ['c1', 'c3']
+        # Moved to another board.
+        self.conn.update_object(self.conn.get_card('c3'), {'idBoard': 'b2'})
+        assert self.ids(list='l2', closed=None) == ['c1']
+        assert len(self.conn.session.request.history) == 1
+
+    def test_invalidated_cards_fetched_again(self):
+        self.ids()
+        self.conn.invalidate(self.conn.get_card('c2'))
+        assert self.ids(list='l2') == ['c2', 'c3']
+        history = self.conn.session.request.history
+        assert len(history) == 2 and '/batch' in history[-1].url
+
+
+class DecodeTests(TrollopTestCase):
+    data = {'/1/boards/b1/cards/': [
+        {'id': 'c1', 'due': '2024-01-02T03:04:05.678Z'},
+        {'id': 'c2', 'due': '2024-01-02T03:04:05.678Z'},
+        {'id': 'c3', 'due': None}]}
+
+    def test_parse_date(self):
+        import isodate
+        from trollop.lib import parse_date
+        for value in ['2024-01-02T03:04:05.678Z', '2024-01-02T03:04:05+02:00',
+                      '2024-01-02T03:04:05Z']:
+            assert parse_date(value) == isodate.parse_datetime(value)
+        assert parse_date(None) is None
+
+    def test_memoized(self):
+        import datetime
+        import isodate
+        card = self.conn.get_board('b1').cards[0]
+        assert card.due is card.due
+        assert card.due.microsecond == 678000
+
+        # Replacing the raw value, by a fetch or an unsaved change, decodes it
+        # again.
+        self.conn.update_object(card, {'due': '2024-02-01T00:00:00.000Z'})
+        assert card.due.month == 2
+        card.due = datetime.datetime(2024, 3, 1, tzinfo=isodate.UTC)
+        assert card.due.month == 3
+        assert self.conn.get_board('b1').cards[2].due is None
+
+    def test_decode_sublists(self):
+        self.conn.decode_sublists = True
+        cards = self.conn.get_board('b1').cards
+        assert cards[0]._decoded['due'][1] is cards[1]._decoded['due'][1]
+        assert cards[0].due is cards[1].due
+
+
+class FakeValidatingRequest(FakeBatchRequest):
+    """Like FakeBatchRequest, but sends ETags, and answers requests whose
+    If-None-Match matches with a 304."""
+
+    def __call__(self, method, url, *args, **kwargs):
+        path = urlparse.urlparse(url).path
+        if path == '/1/batch' or path not in self.data:
+            return super(FakeValidatingRequest, self).__call__(
+                method, url, *args, **kwargs)
+        text = json.dumps(self.data[path], sort_keys=True)
+        etag = '"%x"' % (hash(text) & 0xffffffff)
+        headers = kwargs.get('headers') or {}
+        self.history.append(AttrDict(method=method, url=url, headers=headers))
+        if headers.get('If-None-Match') == etag:
+            return AttrDict(headers={'ETag': etag}, status_code=304, text='')
+        return AttrDict(headers={'ETag': etag}, status_code=200, text=text)
+
+
+class RefreshTests(TrollopTestCase):
+
+    def setUp(self):
+        super(RefreshTests, self).setUp()
+        self.data = {
+            '/1/boards/b1': {'id': 'b1', 'name': 'Idle',
+                             'dateLastActivity': '2024-01-01T00:00:00.000Z'},
+            '/1/boards/b2': {'id': 'b2', 'name': 'Busy',
+                             'dateLastActivity': '2024-01-01T00:00:00.000Z'},
+            '/1/boards/b1/cards/': [{'id': 'c1', 'name': 'One'}],
+            '/1/members/m1': {'id': 'm1', 'username': 'one'},
+            '/1/boards/b1/members/': [{'id': 'm1', 'username': 'one'}],
+        }
+        self.conn.session.request = FakeValidatingRequest({}, self.data)
+        self.history = self.conn.session.request.history
+
+    def test_refresh_by_activity(self):
+        boards = [self.conn.get_board('b1'), self.conn.get_board('b2')]
+        self.conn.fetch_many(boards)
+        boards[0].cards
+        self.data['/1/boards/b2'] = dict(self.data['/1/boards/b2'],
+                                         name='Busier',
+                                         dateLastActivity='2024-02-01T00:00:00.000Z')
+        del self.history[:]
+
+        assert self.conn.refresh(boards) == [boards[1]]
+        assert boards[1].name == 'Busier'
+        # One batch to check both boards, one to fetch the one that changed,
+        # and the idle board's cards are still cached.
+        assert len(self.history) == 2
+        assert boards[0].cards[0].name == 'One'
+        assert len(self.history) == 2
+
+    def test_conditional_requests(self):
+        member = self.conn.get_member('m1')
+        assert member.username == 'one'
+        assert not member.refresh()
+        assert self.history[-1].headers['If-None-Match']
+
+        self.data['/1/members/m1'] = {'id': 'm1', 'username': 'uno'}
+        assert member.refresh()
+        assert member.username == 'uno'
+
+        board = self.conn.get_board('b1')
+        board.members
+        assert not self.conn.refresh_sublist(board, 'members')
+        self.data['/1/boards/b1/members/'].append({'id': 'm2'})
+        assert self.conn.refresh_sublist(board, 'members')
+        assert [m._id for m in board.members] == ['m1', 'm2']
+
+    def test_stale_store_revalidated(self):
+        from trollop.store import SQLiteStore
+        store = SQLiteStore(':memory:', max_age=60)
+        store.set('/boards/b1', self.data['/1/boards/b1'],
+                  fetched=time.time() - 3600)
+        self.conn.store = store
+        board = self.conn.get_board('b1')
+        assert not board.refresh()
+        assert board.name == 'Idle'
+        assert len(self.history) == 1
+        assert store.get('/boards/b1') is not None
+
+
+class FakeDownloads(FakeRequest):
+    """Like FakeRequest, but serves files under https://trello.com/ to be
+    streamed, and reads any body sent."""
+
+    def __init__(self, headers, data, files):
+        super(FakeDownloads, self).__init__(headers, data)
+        self.files = files
+
+    def __call__(self, method, url, *args, **kwargs):
+        kwargs['body'] = getattr(kwargs.get('data'), 'read', lambda: None)()
+        parsed = urlparse.urlparse(url)
+        if parsed.hostname != 'trello.com':
+            return super(FakeDownloads, self).__call__(method, url, **kwargs)
+        self.history.append(AttrDict(method=method, url=url, **kwargs))
+        content = self.files[parsed.path]
+        chunks = lambda size: (content[i:i + size]
+                               for i in range(0, len(content), size))
+        return AttrDict(headers={}, status_code=200, iter_content=chunks,
+                        close=lambda: None)
+
+
+class TransferTests(TrollopTestCase):
+
+    def setUp(self):
+        super(TransferTests, self).setUp()
+        url = 'https://trello.com/1/cards/c1/attachments/a%d/download/%s'
+        self.data = {
+            '/1/cards/c1/attachments': {'id': 'a3'},
+            '/1/boards/b1': {'id': 'b1', 'cards': [
+                {'id': 'c1', 'attachments': [
+                    {'id': 'a1', 'name': 'notes.txt', 'isUpload': True,
+                     'url': url % (1, 'notes.txt')},
+                    {'id': 'a2', 'name': 'Link', 'isUpload': False,
+                     'url': 'https://example.com/'}]},
+                {'id': 'c2', 'attachments': [
+                    {'id': 'a4', 'name': 'big.bin', 'isUpload': True,
+                     'url': url % (4, 'big.bin')}]}]}}
+        self.files = {'/1/cards/c1/attachments/a1/download/notes.txt': b'notes',
+                      '/1/cards/c1/attachments/a4/download/big.bin':
+                          b'x' * 200000}
+        self.conn.session.request = FakeDownloads({}, self.data, self.files)
+        self.history = self.conn.session.request.history
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_attach_streams_through_session(self):
+        import mmap
+        card = self.conn.get_card('c1')
+        buf = mmap.mmap(-1, 100000)
+        buf.write(b'y' * 100000)
+        card.attach('data.bin', buf)
+        request = self.history[-1]
+        assert request.method == 'POST'
+        kwargs = request.kwargs
+        assert kwargs['headers']['Content-Type'].startswith(
+            'multipart/form-data')
+        assert b'filename="data.bin"' in kwargs['body']
+        assert b'y' * 100000 in kwargs['body']
+        assert len(kwargs['data']) == len(kwargs['body'])
+
+    def test_attach_text(self):
+        card = self.conn.get_card('c1')
+        card.attach('notes.txt', u'caf\xe9')
+        kwargs = self.history[-1].kwargs
+        assert b'Content-Type: text/plain' in kwargs['body']
+        assert u'caf\xe9'.encode('utf-8') in kwargs['body']
+        assert len(kwargs['data']) == len(kwargs['body'])
+
+    def test_download(self):
+        import tempfile
+        board = self.conn.get_board('b1',
+                                    prefetch=['cards', 'cards.attachments'])
+        attachment = board.cards[1].attachments[0]
+        assert b''.join(attachment.iter_content(65536)) == b'x' * 200000
+        assert self.history[-1].headers['Authorization'].startswith('OAuth ')
+        with tempfile.NamedTemporaryFile() as f:
+            attachment.download(f)
+            f.flush()
+            assert os.path.getsize(f.name) == 200000
+
+    def test_download_attachments(self):
+        import shutil
+        import tempfile
+        directory = tempfile.mkdtemp()
+        try:
+            results = self.conn.get_board('b1').download_attachments(directory)
+            assert [r.op._id for r in results] == ['a1', 'a4']
+            assert not any(r.error for r in results)
+            with open(os.path.join(directory, 'c1', 'a1', 'notes.txt'),
+                      'rb') as f:
+                assert f.read() == b'notes'
+            assert results[1].result == os.path.join(directory, 'c2', 'a4',
+                                                      'big.bin')
+        finally:
+            shutil.rmtree(directory)
+
+
+class ParsingTests(unittest.TestCase):
+
+    def test_iter_items(self):
+        from trollop.parsing import iter_items
+        items = [{'id': 1, 'name': u'\u0142\xdf\xf6', 'n': [1.5, None]},
+                 12345, u'x', [], True]
+        content = json.dumps(items).encode('utf-8')
+        # However the bytes are split, even mid-character.
+        for size in (1, 2, 3, 100):
+            chunks = [content[i:i + size]
+                      for i in range(0, len(content), size)]
+            assert list(iter_items(chunks)) == items
+        assert list(iter_items([b' [ ] '])) == []
+        # Numbers split where what's arrived is a number already.
+        assert list(iter_items([b'[1.', b'5, 2e', b'3 ]'])) == [1.5, 2000.0]
+        assert list(iter_items([b'[-1', b'0E-1]'])) == [-1.0]
+        with self.assertRaises(ValueError):
+            list(iter_items([content[:-5]]))
+        with self.assertRaises(ValueError):
+            list(iter_items([b'{}']))
+
+    def test_pluggable_loads(self):
+        seen = []
+
+        def loads(content):
+            seen.append(content)
+            return json.loads(content.decode('utf-8'))
+
+        conn = TrelloConnection('blah', 'blerg', loads=loads)
+        conn.session.request = FakeRequest(
+            {}, {'/1/cards/c1': {'id': 'c1', 'name': 'Card'}})
+        assert conn.get_card('c1').name == 'Card'
+        assert isinstance(seen[0], six.binary_type)
+
+
+class ImportTests(unittest.TestCase):
+
+    def run_python(self, code):
+        import subprocess
+        import sys
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.check_output([sys.executable, '-c', code],
+                                       cwd=root).decode('ascii').split()
+
+    def test_dependencies_load_on_first_use(self):
+        loaded = self.run_python(
+            'import sys, trollop\n'
+            'def show():\n'
+            '    print(",".join(m for m in ("requests", "isodate", "json")\n'
+            '                   if m in sys.modules) or "-")\n'
+            'show()\n'
+            'conn = trollop.TrelloConnection("key", "token")\n'
+            'trollop.parse_date("2024-01-02T03:04:05.678Z")\n'
+            'show()\n'
+            'trollop.parse_date("2024-01-02T03:04:05Z")\n'
+            'show()\n'
+            'conn.session\n'
+            'show()\n')
+        assert loaded == ['-', '-', 'isodate', 'requests,isodate,json']
+
+
+class WebhookTests(TrollopTestCase):
+
+    # Recorded webhook deliveries, trimmed to what the receiver reads.
+    payloads = {
+        'move': {
+            'model': {'id': 'b1', 'name': 'Board'},
+            'action': {'id': 'a2', 'type': 'updateCard',
+                       'data': {'board': {'id': 'b1', 'name': 'Board'},
+                                'card': {'id': 'c2', 'idList': 'l2'},
+                                'old': {'idList': 'l1'},
+                                'listBefore': {'id': 'l1'},
+                                'listAfter': {'id': 'l2'}}}},
+        'create': {
+            'model': {'id': 'b1', 'name': 'Board'},
+            'action': {'id': 'a3', 'type': 'createCard',
+                       'data': {'board': {'id': 'b1'},
+                                'card': {'id': 'c3', 'name': 'Three'},
+                                'list': {'id': 'l2'}}}},
+        'comment': {
+            'model': {'id': 'c1', 'name': 'One', 'idList': 'l1',
+                      'idBoard': 'b1', 'pos': 1, 'closed': False,
+                      'badges': {'comments': 1}},
+            'action': {'id': 'a4', 'type': 'commentCard',
+                       'data': {'board': {'id': 'b1'},
+                                'card': {'id': 'c1'},
+                                'text': 'Hello'}}},
+    }
+
+    def setUp(self):
+        super(WebhookTests, self).setUp()
+        self.data = {
+            '/1/boards/b1': {
+                'id': 'b1', 'name': 'Board',
+                'lists': [{'id': 'l1', 'pos': 1}, {'id': 'l2', 'pos': 2}],
+                'cards': [{'id': 'c1', 'name': 'One', 'idList': 'l1',
+                           'idBoard': 'b1', 'closed': False, 'pos': 1},
+                          {'id': 'c2', 'name': 'Two', 'idList': 'l1',
+                           'idBoard': 'b1', 'closed': False, 'pos': 2}]},
+            '/1/lists/l2/cards/': [
+                {'id': 'c3', 'name': 'Three', 'idList': 'l2',
+                 'idBoard': 'b1', 'closed': False, 'pos': 1},
+                {'id': 'c2', 'name': 'Two', 'idList': 'l2',
+                 'idBoard': 'b1', 'closed': False, 'pos': 2}],
+            '/1/webhooks/': {'id': 'w1', 'idModel': 'b1', 'active': True,
+                            'callbackURL': 'https://example.com/hook'},
+            '/1/tokens/blerg/webhooks': [
+                {'id': 'w1', 'idModel': 'b1', 'active': True,
+                 'callbackURL': 'https://example.com/hook'}],
+        }
+        self.conn.session.request = FakeBatchRequest({}, self.data)
+        self.history = self.conn.session.request.history
+        self.board = self.conn.get_board('b1')
+        self.board.prefetch('lists', 'cards', 'lists.cards')
+
+    def post(self, receiver, name, signature=None):
+        import io
+        body = json.dumps(self.payloads[name]).encode('utf-8')
+        environ = {'REQUEST_METHOD': 'POST', 'wsgi.input': io.BytesIO(body),
+                   'CONTENT_LENGTH': str(len(body))}
+        if signature is not None:
+            environ['HTTP_X_TRELLO_WEBHOOK'] = signature
+        statuses = []
+        receiver(environ, lambda status, headers: statuses.append(status))
+        return statuses[0]
+
+    def test_register(self):
+        webhook = self.conn.create_webhook(self.board,
+                                           'https://example.com/hook')
+        request = self.history[-1]
+        assert request.method == 'POST'
+        query = urlparse.parse_qs(urlparse.urlparse(request.url).query)
+        assert query['idModel'] == ['b1']
+        assert webhook.callback_url == 'https://example.com/hook'
+        assert webhook.active is True
+        assert self.conn.get_webhooks() == [webhook]
+
+    def test_token_not_recorded(self):
+        from trollop.stats import TracingHook
+        spans = []
+
+        class FakeSpan(AttrDict):
+            def set_attribute(self, key, value):
+                self[key] = value
+
+            def end(self, end_time):
+                spans.append(self)
+
+        class FakeTracer(object):
+            def start_span(self, name, start_time):
+                return FakeSpan(name=name)
+
+        events = []
+        self.conn.add_hook(events.append)
+        self.conn.add_hook(TracingHook(FakeTracer()))
+        self.conn.get_webhooks()
+        assert events[-1].path == '/tokens/:token/webhooks'
+        assert spans[-1]['http.route'] == '/tokens/:token/webhooks'
+        recorded = [self.conn.metrics(), spans] + [vars(e) for e in events]
+        assert 'blerg' not in repr(recorded)
+
+    def test_receive_applies_and_evicts_without_fetching(self):
+        from trollop.webhooks import WebhookReceiver
+        receiver = WebhookReceiver(self.conn)
+        requests_before = len(self.history)
+        lists = self.board.lists
+
+        assert self.post(receiver, 'move') == '200 OK'
+        assert [c._id for c in lists[0].cards] == ['c1']
+        assert [c._id for c in lists[1].cards] == ['c2']
+        assert self.conn.get_card('c2').list is lists[1]
+
+        # A new card can't be applied in place, so the lists it may be in
+        # are dropped, to be fetched when next read.
+        assert self.post(receiver, 'create') == '200 OK'
+        assert '/cards/c3' not in self.conn.cache
+        assert '/boards/b1/cards/' not in self.conn.cache
+        assert '/lists/l2/cards/' not in self.conn.cache
+        assert [c._id for c in lists[0].cards] == ['c1']
+
+        # The webhook's model comes with each action, and is cached as is.
+        assert self.post(receiver, 'comment') == '200 OK'
+        assert self.conn.get_card('c1')._data['badges'] == {'comments': 1}
+        assert len(self.history) == requests_before
+        assert receiver.sync_for('b1').last_action == 'a3'
+
+        assert [c._id for c in lists[1].cards] == ['c3', 'c2']
+        assert len(self.history) == requests_before + 1
+
+    def test_signatures(self):
+        import base64
+        import hashlib
+        import hmac
+        from trollop.webhooks import WebhookReceiver
+        url = 'https://example.com/hook'
+        receiver = WebhookReceiver(self.conn, secret='shh', callback_url=url)
+        body = json.dumps(self.payloads['move']).encode('utf-8')
+        signature = base64.b64encode(hmac.new(
+            b'shh', body + url.encode('utf-8'), hashlib.sha1).digest())
+
+        assert self.post(receiver, 'move', 'forged') == '401 Unauthorized'
+        assert self.post(receiver, 'move') == '401 Unauthorized'
+        assert [c._id for c in self.board.lists[0].cards] == ['c1', 'c2']
+        assert self.post(receiver, 'move',
+                         signature.decode('ascii')) == '200 OK'
+        assert [c._id for c in self.board.lists[1].cards] == ['c2']
+        status = []
+        receiver({'REQUEST_METHOD': 'HEAD'},
+                 lambda s, h: status.append(s))
+        assert status == ['200 OK']
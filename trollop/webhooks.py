@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+Keep a connection's cache fresh from Trello webhooks, instead of polling.
+Register a webhook for a model with TrelloConnection.create_webhook, and
+serve a WebhookReceiver at its callback URL:
+
+    receiver = WebhookReceiver(conn, secret=app_secret,
+                               callback_url='https://example.com/trello')
+    conn.create_webhook(board, receiver.callback_url)
+
+The receiver is a WSGI application.  In other frameworks, pass the body of
+each POST to receiver.receive, which does no I/O unless fetch is true, so it
+can be called straight from an event loop; trollop.aio.webhook_app wraps a
+receiver as an ASGI application.
+"""
+
+import base64
+import hashlib
+import hmac
+import threading
+
+import six
+
+from .lib import (Action, Board, Card, Checklist, List, Member, Organization,
+                  find_sublist)
+from .sync import (CARD_ACTIONS, CARD_REMOVALS, LIST_ACTIONS, LIST_REMOVALS,
+                   BoardSync)
+
+
+# Actions that a BoardSync applies to the cache.
+SYNCED = CARD_ACTIONS | CARD_REMOVALS | LIST_ACTIONS | LIST_REMOVALS
+
+# The keys of an action's data that name the objects it acted on, and what
+# they are.
+MODELS = (('board', Board), ('card', Card), ('list', List),
+          ('checklist', Checklist), ('member', Member),
+          ('organization', Organization))
+
+
+class InvalidSignature(ValueError):
+    """
+    Raised when a webhook request's X-Trello-Webhook signature doesn't match
+    its body, so it may not come from Trello.
+    """
+
+
+class WebhookReceiver(object):
+    """
+    Applies the actions Trello's webhooks deliver to the cached data and
+    sublists of conn.  Changes to cards and lists are applied in place where
+    the action says what changed, as BoardSync.poll would; otherwise the
+    objects are evicted from the cache (or, if fetch is true, fetched again)
+    along with the sublists they're in.  The model the webhook was
+    registered for, which comes with each action, is cached as it is.
+
+    If secret (your application's OAuth secret) is given, requests whose
+    signature doesn't match are refused.  Trello signs them with the webhook's
+    callback URL, so callback_url must then be exactly the one registered.
+    """
+
+    def __init__(self, conn, secret=None, callback_url=None, fetch=False):
+        if secret is not None and callback_url is None:
+            raise ValueError('checking signatures requires the callback_url')
+        self.conn = conn
+        self.secret = secret
+        self.callback_url = callback_url
+        self.fetch = fetch
+        self._lock = threading.RLock()
+        self._syncs = {}
+
+    def sync_for(self, board):
+        """
+        Return the BoardSync that the actions on board (a Board, or its id)
+        are applied through.  Its last_action is the id of the last one
+        received, from which polling can take over.
+        """
+        board_id = getattr(board, '_id', board)
+        with self._lock:
+            sync = self._syncs.get(board_id)
+            if sync is None:
+                sync = BoardSync(self.conn.get_object(Board, board_id))
+                self._syncs[board_id] = sync
+            return sync
+
+    def verify(self, body, signature):
+        """
+        Raise InvalidSignature unless signature is the one Trello would send
+        with body.  Does nothing without a secret.
+        """
+        if self.secret is None:
+            return
+        digest = hmac.new(self.secret.encode('utf-8'),
+                          body + self.callback_url.encode('utf-8'),
+                          hashlib.sha1).digest()
+        expected = base64.b64encode(digest)
+        if isinstance(signature, six.text_type):
+            signature = signature.encode('ascii', 'replace')
+        if not signature or not hmac.compare_digest(expected, signature):
+            raise InvalidSignature('bad X-Trello-Webhook signature')
+
+    def receive(self, body, signature=None):
+        """
+        Handle a webhook request body (bytes), checking its signature if
+        there's a secret.  Returns the action applied, as JSON.  Raises
+        InvalidSignature, or ValueError if the body isn't a webhook payload.
+        """
+        self.verify(body, signature)
+        payload = self.conn.loads(body)
+        if not isinstance(payload, dict) or \
+                not isinstance(payload.get('action'), dict):
+            raise ValueError('not a Trello webhook payload')
+        return self.apply(payload['action'], payload.get('model'))
+
+    def apply(self, action, model=None):
+        """
+        Apply an action, and the current JSON of the webhook's model, to the
+        cache.  Returns action.
+        """
+        data = action.get('data') or {}
+        board = data.get('board') or {}
+        with self._lock:
+            if action.get('type') in SYNCED and 'id' in board:
+                sync = self.sync_for(board['id'])
+                sync.apply_actions([action], fetch=self.fetch)
+            else:
+                self.evict(action, data)
+            self.forget_actions(data)
+            if model and 'id' in model:
+                self.update_model(data, model)
+        return action
+
+    def evict(self, action, data):
+        """
+        Drop the cached data of the objects an action names, and their
+        sublists.  The board it happened on keeps its sublists, and only
+        loses its own data to an updateBoard.
+        """
+        for key, cls in MODELS:
+            obj_id = (data.get(key) or {}).get('id')
+            if obj_id is None:
+                continue
+            obj = self.conn.get_object(cls, obj_id)
+            if cls is not Board:
+                self.conn.invalidate(obj)
+            elif action.get('type') == 'updateBoard':
+                self.conn.forget(obj._path)
+
+    def forget_actions(self, data):
+        """Drop the cached actions of the objects an action names."""
+        for key, cls in MODELS:
+            obj_id = (data.get(key) or {}).get('id')
+            sublist = find_sublist(cls, Action)
+            if obj_id is not None and sublist is not None:
+                obj = self.conn.get_object(cls, obj_id)
+                self.conn.forget(sublist.path(obj))
+
+    def update_model(self, data, model):
+        """
+        Cache the webhook model's JSON, if the action's data says what kind
+        of object it is.
+        """
+        for key, cls in MODELS:
+            if (data.get(key) or {}).get('id') == model['id']:
+                obj = self.conn.get_object(cls, model['id'])
+                self.conn.update_object(obj, model)
+                return
+
+    def __call__(self, environ, start_response):
+        """
+        The WSGI application.  Answers Trello's HEAD request when a webhook
+        is created, and applies the actions POSTed to it.
+        """
+        method = environ.get('REQUEST_METHOD', 'GET')
+        if method in ('HEAD', 'GET'):
+            return respond(start_response, '200 OK')
+        if method != 'POST':
+            return respond(start_response, '405 Method Not Allowed')
+        try:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        body = environ['wsgi.input'].read(length) if length > 0 else b''
+        try:
+            self.receive(body, environ.get('HTTP_X_TRELLO_WEBHOOK'))
+        except InvalidSignature:
+            return respond(start_response, '401 Unauthorized')
+        except ValueError:
+            return respond(start_response, '400 Bad Request')
+        return respond(start_response, '200 OK')
+
+
+def respond(start_response, status):
+    body = status.encode('ascii')
+    start_response(status, [('Content-Type', 'text/plain'),
+                            ('Content-Length', str(len(body)))])
+    return [body]